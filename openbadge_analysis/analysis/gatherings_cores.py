@@ -1,6 +1,8 @@
 import pandas as pd
 import numpy as np
-import networkx as nx
+from scipy.cluster.hierarchy import linkage, fcluster
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components
 
 
 """This module is based on the paper: Sekara, Vedran, Arkadiusz Stopczynski, and Sune Lehmann. "Fundamental structures of dynamic social networks." Proceedings of the national academy of sciences 113.36 (2016): 9977-9982.
@@ -25,19 +27,37 @@ def extract_groups(m2m):
     pd.DataFrame :
         The groups, as a sets of members with datetime.
     """
-    groups = m2m.groupby('datetime').apply(
-        lambda df:
-        pd.Series([frozenset(c) for c in nx.connected_components(nx.from_pandas_dataframe(df.reset_index(), 'member1', 'member2'))])
-    )
-    groups.name = 'members'
-    
-    return groups.reset_index()[['datetime', 'members']]
+    edges = m2m.reset_index()
+    n_edges = len(edges)
+
+    # Each node of the graph is a member at a given time bin, so that a single
+    # graph holds the social networks of all the time bins
+    codes, nodes = pd.factorize(pd.MultiIndex.from_arrays([
+        pd.concat([edges['datetime'], edges['datetime']], ignore_index=True),
+        pd.concat([edges['member1'], edges['member2']], ignore_index=True)
+    ]))
+    graph = csr_matrix((np.ones(n_edges), (codes[:n_edges], codes[n_edges:])),
+                       shape=(len(nodes), len(nodes)))
+    n_components, labels = connected_components(graph, directed=False)
+
+    # Gather the members of each connected component, by splitting the nodes
+    # sorted by component into contiguous blocks
+    datetimes = nodes.get_level_values(0)
+    members = nodes.get_level_values(1).values
+    components = np.split(np.argsort(labels, kind='mergesort'),
+                          np.cumsum(np.bincount(labels, minlength=n_components))[:-1])
+
+    groups = pd.DataFrame([(datetimes[c[0]], frozenset(members[c])) for c in components if len(c) > 0],
+                          columns=['datetime', 'members'])
+
+    return groups.sort_values('datetime', kind='mergesort').reset_index(drop=True)
 
 
 def _set_similarity(s, t):
     """Computes the similarity between two sets, namely, the ratio of intersection
     size to union size."""
-    return float(len(s.intersection(t)))/len(s.union(t))
+    intersection = len(s & t)
+    return float(intersection)/(len(s) + len(t) - intersection)
 
 
 def _group_distance(g, h, gamma):
@@ -59,6 +79,56 @@ def _group_distance(g, h, gamma):
     return 1. - _set_similarity(g[1], h[1]) * np.exp(-gamma * (dt - 1.))
 
 
+def _group_distances(groups, gamma):
+    """Computes the distance between every pair of groups, as defined by
+    `_group_distance`, and returns it as a condensed distance matrix (i.e. the
+    upper triangle of the distance matrix, flattened row by row, as used by
+    `scipy.spatial.distance`).
+
+    Parameters
+    ----------
+    groups : pd.DataFrame
+        A list of groups, as returned by `extract_groups`.
+
+    gamma : float
+        Exponential decay, for time differences between groups.
+    """
+    n = len(groups)
+
+    # Time of each group, in minutes
+    minutes = groups['datetime'].values.astype('datetime64[ns]').astype(np.int64) / 6e10
+
+    # Membership matrix, with a row for each group and a column for each member,
+    # so that the intersections of a group with all the others are a single
+    # matrix product
+    member_codes = {m: k for k, m in enumerate(set().union(*groups['members']))}
+    membership = np.zeros((n, len(member_codes)), dtype=np.float32)
+    for i, members in enumerate(groups['members']):
+        membership[i, [member_codes[m] for m in members]] = 1.
+    sizes = membership.sum(axis=1).astype(np.float64)
+
+    # Only the upper triangle is computed, and each row is written directly
+    # into a single pre-allocated buffer
+    dist = np.empty(n * (n - 1) // 2)
+    start = 0
+    for i in range(n - 1):
+        row = dist[start:start + n - i - 1]
+        intersection = membership[i+1:].dot(membership[i]).astype(np.float64)
+
+        np.subtract(minutes[i+1:], minutes[i], out=row)
+        np.abs(row, out=row)
+        row -= 1.
+        row *= -gamma
+        np.exp(row, out=row)
+        row *= intersection
+        row /= intersection - sizes[i] - sizes[i+1:]
+        row += 1.
+
+        start += n - i - 1
+
+    return dist
+
+
 def gather_groups(groups, distance_threshold=.49, gamma=.08):
     """Gather groups into gatherings.
     
@@ -85,73 +155,33 @@ def gather_groups(groups, distance_threshold=.49, gamma=.08):
     """
     n = len(groups)
 
-    # Convert the DataFrame to an array for fast indexing
-    ga = groups.as_matrix()
-
-    # `dist` is the distance matrix of gatherings, "indexed by groups"
-    # In other words, `dist` has a column/row for each group.  For each group,
-    # it contains the distance from the gathering of this group, to the gathering
-    # of every other group.
-    # The distance between two gatherings is the minimum distance between every
-    # pair of groups.
-    # We start with having as many gatherings as groups, and so `dist` begins as
-    # the matrix of distances between groups
-    dist = np.zeros((n, n))
-    for i in range(n):
-        for j in range(i+1, n):
-            dist[i, j] = _group_distance(ga[i,:], ga[j,:], gamma=gamma)
-    dist += dist.T
-
-    # We set the invariant on `dist` that two groups in the same gathering have a
-    # distance of 1.0, so they won't be chosen by `np.argmin`
-    np.fill_diagonal(dist, 1.0)
-
-    # Mapping group index -> gathering index
-    # It's initialized as `i -> i` for all i
-    grp2gth = dict(zip(range(n), range(n)))
-    # Mapping gathering index -> groups indices
-    # It's initialized as `i -> [i]` for all i
-    gth2grp = dict(zip(range(n), [[i] for i in range(n)]))
-
-    # As long as there are at least two gatherings
-    while len(gth2grp) > 1:
-        # Pick the minimum distance between two gatherings
-        i, j = np.unravel_index(dist.argmin(), dist.shape)
-
-        # If the minimum distance is above the threshold, stop the algorithm
-        if dist[i,j] > distance_threshold:
-            break
-
-        # Index of the first gathering
-        gth0 = min(grp2gth[i], grp2gth[j])
-        # Index of the second gathering
-        gth1 = max(grp2gth[i], grp2gth[j])
-
-        # Change the gathering index of the groups in the second gathering
-        for g in gth2grp[gth1]:
-            grp2gth[g] = gth0
-
-        # Add the groups of the second gathering to the first
-        gth2grp[gth0].extend(gth2grp[gth1])
-        # Remove the second gathering
-        del gth2grp[gth1]
-
-        # The new distance vector of elements of this new gathering is set as
-        # the minimum of the vectors of the two original gatherings
-        newdist = np.minimum(dist[i,:], dist[j,:])
-
-        # Set the within-gathering distance to 1.0 (enforce the invariant)
-        for g in gth2grp[gth0]:
-            newdist[g] = 1.0
-
-        # Update the distance of each element of the new gathering
-        for g in gth2grp[gth0]:
-            dist[g,:] = newdist  # Column
-            dist[:,g] = newdist  # Row
+    if n == 0:
+        return []
+
+    # `dist` is the condensed matrix of distances between groups
+    dist = _group_distances(groups, gamma=gamma)
+
+    # Groups are merged into gatherings by single-linkage clustering: the
+    # distance between two gatherings is the minimum distance between every
+    # pair of their groups, and the two closest gatherings are merged as long as
+    # their distance is below the threshold
+    if n > 1:
+        linkage_matrix = linkage(dist, method='single')
+        labels = fcluster(linkage_matrix, t=distance_threshold, criterion='distance')
+    else:
+        labels = np.arange(n)
+
+    # Number the gatherings by order of their first group
+    _, first_groups, labels = np.unique(labels, return_index=True, return_inverse=True)
+    labels = np.argsort(np.argsort(first_groups))[labels]
+
+    # Indices of the groups of each gathering, sorted by gathering
+    grp = np.argsort(labels, kind='mergesort')
+    gth2grp = np.split(grp, np.cumsum(np.bincount(labels))[:-1])
 
     # Store each gathering in a DataFrame
     gatherings = [groups.iloc[gs].copy().set_index('datetime').sort_index()['members']
-                  for gs in gth2grp.itervalues()]
+                  for gs in gth2grp]
 
     return gatherings
 
@@ -173,28 +203,32 @@ def _extract_core(gathering):
     """Extracts a core from a given gathering, using the gap significancy test in
     the participation profile."""
 
-    # Extract the list of participants to the gathering for each time bin
-    # The result is a DataFrame listing each member participating at each time bin
-    df = gathering.apply(lambda x: pd.Series(sorted(list(x)))).stack().rename('member').to_frame()
+    # Factorize the time bins and the members into contiguous integer codes
+    times, unique_times = pd.factorize(gathering.index)
+    members = sorted(set().union(*gathering))
+    member_codes = {m: k for k, m in enumerate(members)}
 
-    # Pivot the dataframe, giving a matrix of member vs time bin, with 1 when
-    # a member participated to the gathering at that moment, and 0 otherwise
-    df['participates'] = 1.
-    df = df.reset_index().set_index(['datetime', 'member'])['participates'].unstack().fillna(0.0)
+    # Matrix of time bin vs member, with 1 when a member participated to the
+    # gathering at that moment, and 0 otherwise
+    participates = np.zeros((len(unique_times), len(members)), dtype=np.uint8)
+    for t, group in zip(times, gathering):
+        participates[t, [member_codes[m] for m in group]] = 1
 
-    # Sum the participations and normalize, to get the percentage of participation
-    # for each member
-    participations = (df.sum()/len(df.index)).sort_values(ascending=False)
+    # Average the participations to get the percentage of participation for
+    # each member, and sort them
+    participations = participates.mean(axis=0)
+    order = np.argsort(-participations, kind='mergesort')
+    participations = participations[order]
 
     # Compute the participation gap threshold
-    threshold = _participation_threshold(len(df.columns))
+    threshold = _participation_threshold(len(members))
 
     # Compute the gaps in the sorted participation profiles
-    gaps = participations - participations.shift(-1)
+    significant_gaps = np.append(participations[:-1] - participations[1:] > threshold, False)
 
-    # Return the participations index, truncated after the first significant
-    # gap in participations
-    return list(participations.loc[:(gaps > threshold).idxmax()].index)
+    # Return the members, truncated after the first significant gap in
+    # participations
+    return [members[k] for k in order[:significant_gaps.argmax() + 1]]
 
 
 def extract_cores(gatherings):
@@ -1,11 +1,83 @@
 import json
 import pandas as pd
 import numpy as np
-import itertools
-import datetime
 import traceback
+import itertools
+import binascii
+import functools
+import multiprocessing
+import os
+import hashlib
+import collections
+import array
 import crc16
 
+try:
+    # orjson parses log lines several times faster than the standard library,
+    # but it is an optional dependency
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
+try:
+    # bottleneck provides a moving median that is much faster than pandas' for long
+    # windows, but it is an optional dependency
+    import bottleneck as bn
+except ImportError:
+    bn = None
+
+
+def _iter_lines(file_object, bufsize=1 << 18):
+    """
+    Yields the lines of a file object (without their line endings), reading it in large blocks
+    rather than one line at a time. Other iterables of lines are iterated over as they are
+    :param file_object: a file object, or an iterable of lines
+    :param bufsize: the size of the blocks read from the file
+    :return: an iterator over the lines
+    """
+    if not hasattr(file_object, 'read'):
+        for line in file_object:
+            yield line
+        return
+
+    tail = file_object.read(0)  # an empty str or bytes, depending on the mode of the file
+    newline = b'\n' if isinstance(tail, bytes) else '\n'
+    while True:
+        block = file_object.read(bufsize)
+        if not block:
+            break
+        lines = (tail + block).split(newline)
+        tail = lines.pop()  # the last line may continue in the next block
+        for line in lines:
+            yield line
+    if tail:
+        yield tail
+
+
+def _timestamps_to_datetimes(timestamps, tz):
+    """
+    Converts unix timestamps (in seconds) to datetimes in the given time zone, in a single
+    vectorized pass. Localizing the resulting DatetimeIndex in UTC and converting it to tz only
+    changes its time zone, not its values
+    :param timestamps: an array of unix timestamps, in seconds
+    :param tz: the time zone of the datetimes
+    :return: a DatetimeIndex
+    """
+    return pd.DatetimeIndex(pd.to_datetime(timestamps, unit='s')).tz_localize('UTC').tz_convert(tz)
+
+
+def _columns_to_dataframe(columns):
+    """
+    Creates a DataFrame from an ordered mapping of column names to lists, arrays or typed arrays
+    (array.array). Typed arrays are wrapped without copying
+    :param columns: a collections.OrderedDict of the values of each column
+    :return: a DataFrame with the columns in the order of columns
+    """
+    return pd.DataFrame(collections.OrderedDict(
+        (name, np.frombuffer(values, dtype=values.typecode) if isinstance(values, array.array) else values)
+        for name, values in columns.items()
+    ))
+
 
 def is_meeting_metadata(json_record):
     """
@@ -66,39 +138,43 @@ def metadata_from_file(file_object):
         return None
 
 
-def load_audio_chunks_as_json_objects(file_object, log_version=None, ignore_errors=True):
+def _iter_audio_chunks(file_object, ignore_errors):
     """
-    Loads an audio chunks as jason objects
+    Yields the data of each audio chunk of a version 2.0 log, parsing one line at a time
+    """
+    c = 0
+    for row in _iter_lines(file_object):
+        c += 1
+        try:
+            data = json_loads(row)
+            is_audio = data['type'] == 'audio received'
+        except Exception as e:
+            s = traceback.format_exc()
+            if ignore_errors:
+                print("unexpected failure in line {}, skipping it ({})".format(c, e))
+                continue
+            else:
+                print("unexpected failure in line {}, {} ,{}".format(c, e, s))
+                raise
+        if is_audio:
+            yield data['data']
+
+
+def _iter_audio_chunks_as_json_objects(file_object, log_version=None, ignore_errors=True):
+    """
+    Same as load_audio_chunks_as_json_objects, but the file is read lazily, while iterating over the
+    returned chunks, so it must remain open until they are consumed
     :param file_object: a file object to read from
     :param log_version: defines the log_version if file is missing a header line
     :param ignore_errors: when set to true, skips faulty lines
-    :return:
+    :return: an iterator over the chunks
     """
-    first_data_row = 0 # some file may contain meeting information/header
-
-    raw_data = file_object.readlines()           # This is a list of strings
-
     if log_version == '1.0':
-        first_data_row = 1
-        batched_sample_data = map(json.loads, raw_data[first_data_row:])  # Convert the raw sample data into a json object
+        file_object.readline() # skip the header
+        batched_sample_data = (json_loads(row) for row in _iter_lines(file_object))  # Convert the raw sample data into a json object
 
     elif log_version == '2.0':
-        c = 0
-        batched_sample_data = []
-        for row in raw_data[first_data_row:]:
-            c += 1
-            try:
-                data = json.loads(row)
-                if data['type'] == 'audio received':
-                    batched_sample_data.append(data['data'])
-            except Exception as e:
-                s = traceback.format_exc()
-                if ignore_errors:
-                    print("unexpected failure in line {}, skipping it ({})".format(c, e))
-                    continue
-                else:
-                    print("unexpected failure in line {}, {} ,{}".format(c, e, s))
-                    raise
+        batched_sample_data = _iter_audio_chunks(file_object, ignore_errors)
 
     else:
         raise Exception('Must provide log version')
@@ -106,34 +182,50 @@ def load_audio_chunks_as_json_objects(file_object, log_version=None, ignore_erro
     return batched_sample_data
 
 
-def load_proximity_chunks_as_json_objects(file_object, log_version=None):
+def load_audio_chunks_as_json_objects(file_object, log_version=None, ignore_errors=True):
     """
     Loads an audio chunks as jason objects
     :param file_object: a file object to read from
     :param log_version: defines the log_version if file is missing a header line
-    :return:
+    :param ignore_errors: when set to true, skips faulty lines
+    :return: a list of the chunks
+    """
+    return list(_iter_audio_chunks_as_json_objects(file_object, log_version, ignore_errors))
+
+
+def _iter_proximity_chunks(file_object):
     """
-    first_data_row = 0 # some file may contain meeting information/header
-    meeting_metadata = meeting_log_version_from_file(file_object)
+    Yields the data of each proximity chunk of a version 2.0 log, parsing one line at a time
+    """
+    for row in _iter_lines(file_object):
+        try:
+            data = json_loads(row)
+            is_proximity = data['type'] == 'proximity received'
+        except ValueError:
+            continue
+        if is_proximity:
+            yield data['data']
+
 
-    raw_data = file_object.readlines()           # This is a list of strings
+def _iter_proximity_chunks_as_json_objects(file_object, log_version=None):
+    """
+    Same as load_proximity_chunks_as_json_objects, but the file is read lazily, while iterating over
+    the returned chunks, so it must remain open until they are consumed
+    :param file_object: a file object to read from
+    :param log_version: defines the log_version if file is missing a header line
+    :return: an iterator over the chunks
+    """
+    header_log_version = meeting_log_version_from_file(file_object)
 
-    if meeting_metadata is not None:
-        first_data_row = 1 # skip the header
-        log_version = meeting_log_version(meeting_metadata)
+    if header_log_version is not None:
+        file_object.readline() # skip the header
+        log_version = header_log_version
 
     if log_version == '1.0':
         raise Exception('Version 1.0 does not support proximity data')
 
     elif log_version == '2.0':
-        batched_sample_data = []
-        for row in raw_data[first_data_row:]:
-            try:
-                data = json.loads(row)
-                if data['type'] == 'proximity received':
-                    batched_sample_data.append(data['data'])
-            except ValueError:
-                continue
+        batched_sample_data = _iter_proximity_chunks(file_object)
 
     else:
         raise Exception('file log version was not set and cannot be identified')
@@ -141,6 +233,16 @@ def load_proximity_chunks_as_json_objects(file_object, log_version=None):
     return batched_sample_data
 
 
+def load_proximity_chunks_as_json_objects(file_object, log_version=None):
+    """
+    Loads an audio chunks as jason objects
+    :param file_object: a file object to read from
+    :param log_version: defines the log_version if file is missing a header line
+    :return: a list of the chunks
+    """
+    return list(_iter_proximity_chunks_as_json_objects(file_object, log_version))
+
+
 def sample2data(input_file_path, datetime_index=True, resample=True, log_version=None, ignore_errors=True):
     """
     Loads audio data form file and converts it to audio samples.
@@ -157,48 +259,49 @@ def sample2data(input_file_path, datetime_index=True, resample=True, log_version
         if log_version is None:
             log_version = meeting_log_version_from_file(input_file)
         meeting_metadata = metadata_from_file(input_file)
-        batched_sample_data = load_audio_chunks_as_json_objects(file_object=input_file, log_version=log_version, ignore_errors=ignore_errors)
+        df_batches = pd.DataFrame(_iter_audio_chunks_as_json_objects(file_object=input_file, log_version=log_version,
+                                                                     ignore_errors=ignore_errors))
 
-    sample_data = []
-    
-    for j in range(len(batched_sample_data)):
-        batch = {}
-        batch.update(batched_sample_data[j]) #Create a deep copy of the jth batch of samples
-        samples = batch.pop('samples')
-        if log_version == '1.0':
-            reference_timestamp = batch.pop('timestamp')*1000+batch.pop('timestamp_ms') #reference timestamp in milliseconds
-            sampleDelay = batch.pop('sampleDelay')
-        elif log_version == '2.0':
-            reference_timestamp = batch.pop('timestamp')*1000 #reference timestamp in milliseconds
-            sampleDelay = batch.pop('sample_period')
-        numSamples = len(samples)
-        #numSamples = batch.pop('numSamples')
-        for i in range(numSamples):
-            sample = {}
-            sample.update(batch)
-            sample['signal'] = samples[i]
-
-            sample['timestamp'] = reference_timestamp + i*sampleDelay
-            sample_data.append(sample)
-
-    df_sample_data = pd.DataFrame(sample_data)
-    if len(sample_data)==0:
+    if len(df_batches)==0:
         return None
-    df_sample_data['datetime'] = pd.to_datetime(df_sample_data['timestamp'], unit='ms')
-    df_sample_data['datetime'] = df_sample_data['datetime'] - np.timedelta64(4, 'h') # note - hard coded EST time conversion
-    del df_sample_data['timestamp']
 
-    df_sample_data.sort_values('datetime')
+    samples = df_batches.pop('samples')
+    if log_version == '1.0':
+        reference_timestamps = df_batches.pop('timestamp')*1000+df_batches.pop('timestamp_ms') #reference timestamp in milliseconds
+        sample_delays = df_batches.pop('sampleDelay')
+    elif log_version == '2.0':
+        reference_timestamps = df_batches.pop('timestamp')*1000 #reference timestamp in milliseconds
+        sample_delays = df_batches.pop('sample_period')
+    sampleDelay = sample_delays.iloc[-1]
+    num_samples = samples.map(len).values
+
+    if num_samples.sum()==0:
+        return None
+
+    # Expand the batches into samples: the batch fields are repeated for each of its samples, and the
+    # timestamp of a sample is the reference timestamp of its batch plus its offset within the batch
+    batch_of_sample = np.repeat(np.arange(len(df_batches)), num_samples)
+    sample_in_batch = np.arange(len(batch_of_sample)) - (np.cumsum(num_samples) - num_samples)[batch_of_sample]
+
+    df_sample_data = df_batches.iloc[batch_of_sample].reset_index(drop=True)
+    df_sample_data['signal'] = list(itertools.chain.from_iterable(samples))
+    df_sample_data['timestamp'] = reference_timestamps.values[batch_of_sample] \
+                                  + sample_in_batch*sample_delays.values[batch_of_sample]
+
+    # Convert the timestamps in a single pass, directly into a DatetimeIndex
+    datetimes = pd.to_datetime(df_sample_data.pop('timestamp').values, unit='ms')
+    datetimes = datetimes - np.timedelta64(4, 'h') # note - hard coded EST time conversion
+    datetimes.name = 'datetime'
 
     if(datetime_index):
-        df_sample_data.set_index(pd.DatetimeIndex(df_sample_data['datetime']),inplace=True)
+        df_sample_data.index = datetimes
         #The timestamps are in UTC. Convert these to EST
         #df_sample_data.index = df_sample_data.index.tz_localize('utc').tz_convert('US/Eastern')
-        df_sample_data.index.name = 'datetime'
-        del df_sample_data['datetime']
         if(resample):
             grouped = df_sample_data.groupby('member')
             df_resampled = grouped.resample(rule=str(sampleDelay)+"L").mean()
+    else:
+        df_sample_data['datetime'] = datetimes
 
     if(resample):
         # Optional: Add the meeting metadata to the dataframe
@@ -210,66 +313,90 @@ def sample2data(input_file_path, datetime_index=True, resample=True, log_version
         return df_sample_data
 
 
+def _rolling_median(df, window, min_periods=None):
+    """
+    Rolling median of each column of a DataFrame, equivalent to df.rolling(window, min_periods).median().
+    Uses bottleneck's double-heap moving median when it is installed, and pandas' skiplist
+    implementation otherwise; both update the median in O(log window) per sample. bottleneck rejects
+    windows longer than the data, so frames shorter than the window always go through pandas
+    :param df:
+    :param window: size of the moving window, in samples
+    :param min_periods: minimum number of observations in the window required to have a value
+    :return:
+    """
+    if min_periods is None:
+        min_periods = window
+    if bn is not None and window <= len(df):
+        return pd.DataFrame(bn.move_median(df.values, window=window, min_count=min_periods, axis=0),
+                            index=df.index, columns=df.columns)
+    else:
+        return df.rolling(window=window, min_periods=min_periods, center=False).median()
+
+
 def is_speaking(df_meeting, sampleDelay = 50):
     frame_size = 1000 #milliseconds
     median_window = 2*60*1000 #milliseconds
     median_window = int(median_window/sampleDelay)
     power_window = int(frame_size/sampleDelay)
     clipping_value = 120 #Maximum value of volume above which the signal is assumed to have non-speech external noise
-    df_meeting = df_meeting.clip(upper=clipping_value)
+    #The clipped volume easily fits in single precision, which halves the memory used by the rolling windows
+    df_meeting = df_meeting.clip(upper=clipping_value).astype(np.float32)
     avg_speech_power_threshold = 42
     #Calculate the rolling median and subtract this value from the volume
-    df_median = df_meeting.apply(lambda x:x.rolling(min_periods=1,window=median_window,center=False).median())
-    df_normalized = df_meeting - df_median
+    #Both frames share the same index and columns, so this is done on the arrays, without alignment
+    energy = df_meeting.values - _rolling_median(df_meeting, window=median_window, min_periods=1).values
     #Calculate power and apply avg speech power threshold
-    df_energy = df_normalized.apply(np.square)
-    df_power = df_energy.apply(lambda x:x.rolling(window=power_window, min_periods=1,center=False).mean())
-    df_is_speech = df_power > avg_speech_power_threshold
-    #df_is_speech.plot(kind='area',subplots=True);plt.show()
-    df_max_power = df_power.apply(np.max,axis=1)
-    df_is_winner = df_power.apply(lambda x:x==df_max_power) #Find the badge with the highest power reading at every sample interval and declare it to be the main speaker
+    np.square(energy, out=energy)
+    df_energy = pd.DataFrame(energy, index=df_meeting.index, columns=df_meeting.columns)
+    df_power = df_energy.rolling(window=power_window, min_periods=1,center=False).mean()
+    power = df_power.values
+    #Find the badge with the highest power reading at every sample interval and declare it to be the main speaker
     #The assumption here is that there is only one speaker at any given time
+    is_winner = power == np.nanmax(power, axis=1)[:, np.newaxis]
 
-    df_is_speech = df_is_speech & df_is_winner
+    df_is_speech = pd.DataFrame((power > avg_speech_power_threshold) & is_winner,
+                                index=df_power.index, columns=df_power.columns)
     return df_is_speech
 
 
+def _fill_boolean_segments(x, min_length, value):
+    #Same as fill_boolean_segments, on a numpy boolean array. The array is run-length encoded
+    #so that all the short segments can be inverted at once, without looping over the samples
+    if len(x) == 0:
+        return
+    starts = np.r_[0, np.flatnonzero(np.diff(x.astype(np.int8))) + 1]
+    lengths = np.diff(np.r_[starts, len(x)])
+    #As in the original sample loop, the last segment is measured and filled without its last sample
+    lengths[-1] -= 1
+    to_invert = (lengths < min_length) & (x[starts] == value)
+    x[:-1] ^= np.repeat(to_invert, lengths)
+
+
 def fill_boolean_segments(x_series, min_length, value):
     #Given a boolean series fill in all value (True or False) sequences less than length min_length with their inverse
-    total_samples = len(x_series)
-    not_value = not value
-    i=0
-    length=0
-    start=0
-    while(i<total_samples):
-        current_value = x_series[i]
-        if(i==0):
-            previous_value = current_value
-
-        if((previous_value != current_value) or (i==total_samples-1)):
-            stop = i
-            if(length<min_length and previous_value==value):
-                x_series[start:stop] = not_value
-            length=1
-            start=i
-        else:
-            length+=1
-        i=i+1
-        previous_value = current_value
+    #The series (or numpy array) is modified in place
+    if isinstance(x_series, pd.Series):
+        x = x_series.values.astype(bool)
+        _fill_boolean_segments(x, min_length, value)
+        x_series[:] = x
+    else:
+        _fill_boolean_segments(x_series, min_length, value)
 
 
 def make_stitched(df_is_speech, min_talk_length=2000, min_gap_size=500, sampleDelay = 50):
     min_talk_length_samples = int(min_talk_length/sampleDelay)
     min_gap_size_samples = int(min_gap_size/sampleDelay)
-    df_is_gap = df_is_speech.copy()
+    #Copy the data once into a column-major boolean array, so that each member is a contiguous column
+    is_gap = np.array(df_is_speech.values, dtype=bool, order='F')
 
-    for member in df_is_speech.columns.values:
+    for k in range(is_gap.shape[1]):
         #First fill all the gaps less than min_gap_size (milliseconds)
-        #Set the corresponding samples to True in df_is_gap
-        fill_boolean_segments(df_is_gap[member],min_gap_size_samples,False)
+        #Set the corresponding samples to True in is_gap
+        _fill_boolean_segments(is_gap[:, k],min_gap_size_samples,False)
         #Then find all the True segments which are less than min_talk_length (milliseconds) and invert them
-        fill_boolean_segments(df_is_gap[member],min_talk_length_samples,True)
+        _fill_boolean_segments(is_gap[:, k],min_talk_length_samples,True)
 
+    df_is_gap = pd.DataFrame(is_gap, index=df_is_speech.index, columns=df_is_speech.columns)
     return df_is_gap
 
 
@@ -292,40 +419,295 @@ def make_df_stitched(df_meeting):
 #takes in df from make_df_stitched
 def get_turns(df_stitched, sampleDelay=50):
     all_stats=[]
-    for member in df_stitched.columns.values:
+    # If NaN values for a member, e.g. when creating values for multiple meetings, but a member wasn't in one of the
+    # meetings, fill NaN with 0
+    df_stitched.fillna(0, inplace=True)
+    # Count the turns and speaking samples of all the members at once
+    is_speaking = df_stitched.values.astype(bool)
+    # A turn starts wherever the member is speaking and was not speaking at the previous sample
+    turn_starts = is_speaking.copy()
+    turn_starts[1:] &= ~is_speaking[:-1]
+    total_turns = turn_starts.sum(axis=0)  # includes self-turns
+    total_speaking_samples = is_speaking.sum(axis=0)
+    for k, member in enumerate(df_stitched.columns.values):
         current_member = {}
         #current_member['date'] = df_stitched.index[0].strftime('%Y-%m-%d')
         current_member['member'] = member
-        #print([(key, list(group)) for key, group in itertools.groupby(df_stitched[member])])
-        current_member['totalTurns'] = len([ sum( 1 for _ in group ) for key, group in itertools.groupby(df_stitched[member]) if key ])  # includes self-turns
-        # If NaN values for a member, e.g. when creating values for multiple meetings, but a member wasn't in one of the
-        # meetings, fill NaN with 0
-        df_stitched.fillna(0, inplace=True)
-        current_member['totalSpeakingTime'] = datetime.timedelta(milliseconds=sum(df_stitched[member])*sampleDelay).total_seconds()
+        current_member['totalTurns'] = int(total_turns[k])
+        current_member['totalSpeakingTime'] = float(total_speaking_samples[k]*sampleDelay)/1000
         all_stats.append(current_member)
     return all_stats
 
 
 def total_turns(df_stitched):
-    df_turns = pd.DataFrame()
     members_stats = get_turns(df_stitched)
-    df_turns = df_turns.append(pd.DataFrame(members_stats))
+    df_turns = pd.DataFrame(members_stats)
     duration = (df_stitched.index[-1] - df_stitched.index[0]).total_seconds()
     df_turns.duration = duration
     #columns: member, totalSpeakingTime, totalTurns for each member
     return df_turns
 
 
+# Cache of the ids computed by mac_address_to_id, indexed by MAC address
+_mac_address_ids = {}
+
+
 def mac_address_to_id(mac):
     """Converts a MAC address to an id used by the badges for the proximity pings.
+    The ids are cached, since the same few badges appear in every chunk of a log.
+    """
+    if mac not in _mac_address_ids:
+        # convert hex to bytes and reverse
+        macstr = binascii.unhexlify(mac.replace(':', ''))[::-1]
+        _mac_address_ids[mac] = crc16.crc16xmodem(macstr,0xFFFF)
+    return _mac_address_ids[mac]
+
+
+_MEMBER_BADGES_COLUMNS = ('member', 'badge_address', 'id', 'timestamp')
+
+
+def _dedup_period(time_bins_size):
+    """
+    Returns the period (in seconds) within which records always end up in the same time bin, for
+    time bins of the given size: records that fall within the same minute when the bins are made
+    of whole minutes (or calendar periods), or None if only records with the same timestamp do
+    :param time_bins_size: the size of the time bins, as a pandas offset alias
+    :return: 60, or None
+    """
+    time_bins_offset = pd.tseries.frequencies.to_offset(time_bins_size)
+    if isinstance(time_bins_offset, pd.tseries.offsets.Tick) and time_bins_offset.nanos % (60 * 10**9) != 0:
+        return None
+    return 60
+
+
+def _time_bin_starts(datetimes, time_bins_size):
+    """
+    Returns the start of the time bin of each datetime, for time bins of the given size, in nanoseconds
+    since the epoch, computed by flooring the local times with integer arithmetic. Only bins that divide
+    an hour are supported
+    :param datetimes: a DatetimeIndex, naive or localized
+    :param time_bins_size: the size of the time bins, as a pandas offset alias
+    :return: an array of int64, or None if the bins do not divide an hour
+    """
+    time_bins_offset = pd.tseries.frequencies.to_offset(time_bins_size)
+    if not isinstance(time_bins_offset, pd.tseries.offsets.Tick) or (3600 * 10**9) % time_bins_offset.nanos != 0:
+        return None
+
+    local_datetimes = datetimes if datetimes.tz is None else datetimes.tz_localize(None)
+    nanos = datetimes.values.astype('datetime64[ns]').astype(np.int64)
+    local_nanos = local_datetimes.values.astype('datetime64[ns]').astype(np.int64)
+
+    # Bins that divide an hour never span a change of UTC offset, so the start of the bin of each
+    # datetime is the datetime, minus its offset into the bin in local time
+    return nanos - local_nanos % time_bins_offset.nanos
+
+
+def _time_bins_grouper(df, time_bins_size, key='datetime'):
+    """
+    Returns a grouper that puts the rows of df in time bins of the given size, according to their
+    datetimes in column key. When the bins divide an hour, the bin of each row is computed
+    directly, by flooring its local time with integer arithmetic, and replaces its datetime in
+    df[key], and the column itself is returned. Otherwise, a TimeGrouper is returned
+    :param df: the DataFrame to group, with datetimes in column key
+    :param time_bins_size: the size of the time bins, as a pandas offset alias
+    :param key: the column of the datetimes
+    :return: the column name, or a TimeGrouper
+    """
+    datetimes = pd.DatetimeIndex(df[key])
+    bin_starts = _time_bin_starts(datetimes, time_bins_size)
+    if bin_starts is None:
+        return pd.TimeGrouper(time_bins_size, key=key)
+
+    bins = pd.DatetimeIndex(pd.to_datetime(bin_starts))
+    if datetimes.tz is not None:
+        bins = bins.tz_localize('UTC').tz_convert(datetimes.tz)
+    df[key] = bins
+    return key
+
+
+# Version of the cached results, part of their cache key. Bump it whenever a log reader changes what it
+# returns (e.g. the columns or their dtypes), so that results cached by the previous version are not loaded
+_LOG_CACHE_VERSION = 3
+
+
+def _log_cache_path(filename, reader, cache_dir, kwargs):
+    """
+    Returns the path where the result of reading a log with the given reader and arguments is cached.
+    The path depends on the content of the log, so that a modified log is read again
+    """
+    key = (_LOG_CACHE_VERSION, reader.__module__, reader.__name__, sorted(kwargs.items()))
+    digest = hashlib.sha1(repr(key).encode('utf-8'))
+    with open(filename, 'rb') as f:
+        for block in iter(functools.partial(f.read, 1 << 20), b''):
+            digest.update(block)
+    return os.path.join(cache_dir, digest.hexdigest() + '.npz')
+
+
+def _save_log_cache(file_object, result):
     """
-    # convert hex to bytes and reverse
-    macstr = mac.replace(':', '').decode('hex')[::-1]
-    crc = crc16.crc16xmodem(macstr,0xFFFF)
-    return crc
+    Saves the result of a log reader to a file, in the format of numpy's .npz files, without pickling
+    anything. The result must be a DataFrame or an array, or a tuple of them. Each column is saved as
+    its own array, and object columns, which must hold str (e.g. the member names), are saved as
+    unicode arrays. The index of the DataFrames is not saved
+    :param file_object: a file object opened for writing, in binary mode
+    :param result: the result to save
+    :return:
+    """
+    parts = result if isinstance(result, tuple) else (result,)
+    arrays = {}
+    kinds = []
+    for i, part in enumerate(parts):
+        if isinstance(part, pd.DataFrame):
+            kinds.append('frame')
+            arrays['{}.columns'.format(i)] = np.array(part.columns, dtype='U')
+            values = [np.asarray(part[column]) for column in part.columns]
+        elif isinstance(part, np.ndarray):
+            kinds.append('array')
+            values = [part]
+        else:
+            raise TypeError('Cannot cache a reader result of type {}'.format(type(part)))
+        for j, value in enumerate(values):
+            arrays['{}.{}'.format(i, j)] = value.astype('U') if value.dtype == object else value
+    arrays['kinds'] = np.array(kinds, dtype='U')
+    arrays['is_tuple'] = np.array(isinstance(result, tuple))
+    np.savez(file_object, **arrays)
+
+
+def _load_log_cache(path):
+    """
+    Loads a reader result saved by `_save_log_cache`. The unicode arrays are loaded as object arrays of
+    str, like the readers return them
+    :param path: the path of the file
+    :return: the result
+    """
+    with np.load(path, allow_pickle=False) as data:
+        arrays = dict(data.items())
+
+    def load(key):
+        value = arrays[key]
+        return value.astype(object) if value.dtype.kind == 'U' else value
+
+    parts = []
+    for i, kind in enumerate(arrays['kinds']):
+        if kind == 'frame':
+            columns = arrays['{}.columns'.format(i)]
+            parts.append(pd.DataFrame(collections.OrderedDict(
+                (str(column), load('{}.{}'.format(i, j))) for j, column in enumerate(columns)
+            ), columns=[str(column) for column in columns]))
+        else:
+            parts.append(load('{}.0'.format(i)))
+    return tuple(parts) if arrays['is_tuple'] else parts[0]
+
+
+def _read_log(filename, reader, cache_dir=None, **kwargs):
+    """
+    Opens a log and reads it with the given reader, or loads the result from the cache directory if
+    the log was already read there. The results are cached in .npz files, one array per column, see
+    `_save_log_cache`. They are loaded without unpickling anything, so a shared or stale cache directory
+    cannot run code. See `_read_logs`
+    """
+    if cache_dir is not None:
+        path = _log_cache_path(filename, reader, cache_dir, kwargs)
+        if os.path.exists(path):
+            return _load_log_cache(path)
+
+    with open(filename, 'r') as f:
+        result = reader(f, **kwargs)
+
+    if cache_dir is not None:
+        # The result is written to a temporary file that is then renamed, so that the cache never
+        # holds a partially written result
+        temp_path = '{}.{}.tmp'.format(path, os.getpid())
+        with open(temp_path, 'wb') as f:
+            _save_log_cache(f, result)
+        try:
+            os.rename(temp_path, path)
+        except OSError:
+            # On Windows, rename fails if the destination exists, e.g. when another process cached
+            # the same log in the meantime. Its result is the same, so it is kept
+            if not os.path.exists(path):
+                raise
+            os.remove(temp_path)
+
+    return result
+
+
+def _map(func, items, n_jobs=1):
+    """
+    Calls func on each item, in parallel processes if n_jobs is not 1. func must be picklable (e.g. a
+    module-level function, or a functools.partial of one), so that it can be sent to the processes
+    :param func: the function to call
+    :param items: the arguments of each call
+    :param n_jobs: number of processes. Defaults to 1, i.e. func is called in the current process,
+    one item after the other. If None, uses all the CPUs
+    :return: the list of the values returned by func, in the order of items
+    """
+    if n_jobs == 1:
+        return [func(item) for item in items]
+
+    pool = multiprocessing.Pool(n_jobs)
+    try:
+        return pool.map(func, items)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def _read_logs(logs, reader, n_jobs=1, cache_dir=None, **kwargs):
+    """
+    Reads each log with the given reader, in parallel processes if n_jobs is not 1. The reader
+    must be a module-level function, so that it can be sent to the processes
+    :param logs: paths to the logs
+    :param reader: function called with the file object of each log, and kwargs
+    :param n_jobs: number of processes used to read the logs. Defaults to 1, i.e. the logs are read
+    one after the other. If None, uses all the CPUs
+    :param cache_dir: directory where the result of reading each log is cached (as a .npz file of its
+    columns), so that the logs are only parsed again when they change. Defaults to None, i.e. no caching
+    :return: the list of the values returned by reader, in the order of logs
+    """
+    if cache_dir is not None and not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir)
+
+    return _map(functools.partial(_read_log, reader=reader, cache_dir=cache_dir, **kwargs), logs, n_jobs)
 
 
-def load_member_badges_from_logs(logs, log_version=None, log_kind='audio', time_bins_size='1min', tz='US/Eastern'):
+def _load_member_badges_from_log(filename, log_version=None, log_kind='audio', dedup_period=None):
+    """Extracts the member, badge address, id and timestamp of the chunks of a single log,
+    as a dict of column arrays.  Only the first chunk of each member and badge address within
+    each `dedup_period` seconds is kept (or within each timestamp, if None).
+    See `load_member_badges_from_logs`.
+    """
+    if log_kind == 'proximity':
+        load_chunks = _iter_proximity_chunks_as_json_objects
+    else:
+        load_chunks = _iter_audio_chunks_as_json_objects
+
+    # Extract relevant information from chunks, skipping the duplicates before they reach pandas
+    # The values are accumulated in one list per column, so that pandas does not have to
+    # transpose rows
+    members, badge_addresses, timestamps = [], [], []
+    seen = set()
+    with open(filename, 'r') as f:
+        for chunk in load_chunks(f, log_version=log_version):
+            member, badge_address, timestamp = chunk['member'], chunk['badge_address'], chunk['timestamp']
+            key = (member, badge_address, timestamp if dedup_period is None else timestamp // dedup_period)
+            if key not in seen:
+                seen.add(key)
+                members.append(member)
+                badge_addresses.append(badge_address)
+                timestamps.append(timestamp)
+    df = pd.DataFrame({'member': members, 'badge_address': badge_addresses, 'timestamp': timestamps},
+                      columns=('member', 'badge_address', 'timestamp'))
+
+    # Compute the id from the address, once per distinct address
+    addresses = df['badge_address'].unique()
+    df.insert(2, 'id', df['badge_address'].map(dict(zip(addresses, map(mac_address_to_id, addresses)))))
+
+    return {name: df[name].values for name in _MEMBER_BADGES_COLUMNS}
+
+
+def load_member_badges_from_logs(logs, log_version=None, log_kind='audio', time_bins_size='1min', tz='US/Eastern',
+                                 n_jobs=1):
     """Extracts the badge address and id of every badge used by each member, at each moment,
     for a given time bins size.
     
@@ -343,6 +725,10 @@ def load_member_badges_from_logs(logs, log_version=None, log_kind='audio', time_
     time_bins_size : str
         The size, in units of time, of the time bins used for the resampling.
         Defaults to '1min', the resolution of the badges
+
+    n_jobs : int or None
+        The number of processes used to load the logs in parallel.  Defaults to 1,
+        i.e. the logs are loaded one after the other.  If None, uses all the CPUs.
     
     Returns
     -------
@@ -350,55 +736,34 @@ def load_member_badges_from_logs(logs, log_version=None, log_kind='audio', time_
         The id, MAC address and owner of each badge that appeared in `logs`.
     """
     
-    if log_kind == 'audio':
-        load_chunks = load_audio_chunks_as_json_objects
-    elif log_kind == 'proximity':
-        load_chunks = load_proximity_chunks_as_json_objects
-    else:
+    if log_kind not in ('audio', 'proximity'):
         raise ValueError("Log kind {} not recoginzed".format(log_kind))
 
-    fulldf = pd.DataFrame(columns=(
-        'datetime', 'member', 'badge_address', 'id'
-    ))
-
-    fulldf['datetime'] = pd.to_datetime(fulldf['datetime'], unit='s', utc=True) \
-                       .dt.tz_localize('UTC').dt.tz_convert(tz)
-    
     # Load chunks
     # A chunk contains a set of observations by a given badge at a given timestamp
-    for filename in logs:
-        chunks = []
-        with open(filename, 'r') as f:
-            chunks.extend(load_chunks(f, log_version=log_version))
-
-        # Extract relevant information from chunks, i.e. member and id (from address)
-        data = [(
-            chunk['member'],
-            chunk['badge_address'],
-            mac_address_to_id(chunk['badge_address']),
-            chunk['timestamp']
-        ) for chunk in chunks]
-
-        # Encapsulate the data in a DataFrame
-        df = pd.DataFrame(data, columns=(
-            'member', 'badge_address', 'id', 'timestamp'
-        )).drop_duplicates()
-
-        del data
-
-        # Convert the timestamp to a datetime, localized in UTC
-        df['datetime'] = pd.to_datetime(df['timestamp'], unit='s', utc=True) \
-                .dt.tz_localize('UTC').dt.tz_convert(tz)
-        del df['timestamp']
-
-        fulldf = fulldf.append(df)
-        del df
-    
+    # The columns of each file are concatenated once at the end, and a single
+    # DataFrame is built from them, rather than one per file
+    # Only the first chunk of a member and badge within each dedup period is loaded
+    load_log = functools.partial(_load_member_badges_from_log, log_version=log_version, log_kind=log_kind,
+                                 dedup_period=_dedup_period(time_bins_size))
+    columns = {name: [] for name in _MEMBER_BADGES_COLUMNS}
+    for log_columns in _map(load_log, logs, n_jobs):
+        for name in _MEMBER_BADGES_COLUMNS:
+            columns[name].append(log_columns[name])
+
+    if len(logs) > 0:
+        fulldf = pd.DataFrame({name: np.concatenate(columns[name]) for name in _MEMBER_BADGES_COLUMNS},
+                              columns=_MEMBER_BADGES_COLUMNS)
+    else:
+        fulldf = pd.DataFrame(columns=_MEMBER_BADGES_COLUMNS)
+
+    # Convert the timestamp to a datetime, localized in UTC
+    fulldf['datetime'] = _timestamps_to_datetimes(fulldf.pop('timestamp').values, tz)
+
     # Group by id and resample
     fulldf = fulldf.groupby([
-        pd.TimeGrouper(time_bins_size, key='datetime'),
+        _time_bins_grouper(fulldf, time_bins_size),
         'id'
     ]).first()
     
     return fulldf
-
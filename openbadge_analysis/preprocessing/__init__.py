@@ -5,10 +5,13 @@ from .raw import split_raw_data_by_day
 from .metadata import id_to_member_mapping
 from .metadata import legacy_id_to_member_mapping
 from .metadata import voltages
+from .metadata import voltages_from_logs
 from .metadata import sample_counts
+from .metadata import sample_counts_from_logs
 
 
 from .proximity import member_to_badge_proximity
+from .proximity import member_to_badge_proximity_from_logs
 from .proximity import member_to_member_proximity
 from .proximity import member_to_beacon_proximity
 from .proximity import member_to_beacon_proximity_smooth
@@ -2,7 +2,6 @@ import warnings
 warnings.filterwarnings('ignore')
 import matplotlib.pyplot as plt
 import pandas as pd
-import scipy.stats as stats
 import numpy as np
 import seaborn as sns
 import os,sys
@@ -10,7 +9,8 @@ import itertools
 import datetime
 import scipy.signal as signal
 import matplotlib.dates as mdates
-from sklearn.neighbors.kde import KernelDensity
+from sklearn.neighbors import KernelDensity
+from ..core import _rolling_median
 ## if you want to use optimization for kde, uncomment the following two lines.
 # from sklearn.grid_search import GridSearchCV
 # from sklearn.cross_validation import LeaveOneOut
@@ -28,7 +28,7 @@ def get_meet_flt(df_meet, window=8):
     data processing with median filter.
 
     """
-    df_flt = pd.rolling_median(df_meet, window=window)
+    df_flt = _rolling_median(df_meet, window=window)
     return df_flt
 
 def get_df_cor(df_meeting, sel_users):
@@ -37,37 +37,133 @@ def get_df_cor(df_meeting, sel_users):
     """
     df_meeting_sel = df_meeting[sel_users]    
     df_sel_sec = get_meet_sec(df_meeting_sel)
-    ts = []
-    cors = []
-    for i in df_sel_sec.index.unique():
-        frame = df_sel_sec.loc[i]
-        dfa, dfb = frame[sel_users[0]], frame[sel_users[1]]
-        p = stats.pearsonr(dfa, dfb)[0]
-        if not np.isnan(p):
-            ts.append(i)
-            cors.append(p)
-    df_cor = pd.DataFrame(np.vstack([ts, cors]).T, columns=['time', 'cor'])
-    df_cor.set_index('time', inplace=True)
+    gps = df_sel_sec.groupby(df_sel_sec.index)
+    sizes = gps.size()
+    rate = sizes.iloc[0] if len(sizes) > 0 else 0
+    if rate > 0 and (sizes.values == rate).all() and df_sel_sec.index.is_monotonic_increasing:
+        ## every second has the same number of samples, stored contiguously: reshape the samples
+        ## to (seconds, samples, users) and reduce along the samples
+        X = df_sel_sec.values.reshape(len(sizes), rate, 2)
+        dev = X - X.mean(axis=1, keepdims=True)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cors = (dev[:, :, 0] * dev[:, :, 1]).sum(axis=1) \
+                 / np.sqrt((dev[:, :, 0] ** 2).sum(axis=1) * (dev[:, :, 1] ** 2).sum(axis=1))
+        ## a second with a missing sample has a nan correlation already
+        cors = pd.Series(np.clip(cors, -1, 1), index=sizes.index)
+    else:
+        ## center the samples within each second, then compute the correlations of all seconds at once
+        dev = df_sel_sec.values - gps.transform('mean').values
+        df_prod = pd.DataFrame({'ab': dev[:, 0] * dev[:, 1], 'aa': dev[:, 0] ** 2, 'bb': dev[:, 1] ** 2},
+                               index=df_sel_sec.index)
+        sums = df_prod.groupby(level=0).sum()
+        cors = (sums['ab'] / np.sqrt(sums['aa'] * sums['bb'])).clip(-1, 1)
+        ## a second with a missing sample has no correlation
+        cors[gps.count().min(axis=1) < sizes] = np.nan
+    df_cor = pd.DataFrame({'cor': cors.dropna()})
+    df_cor.index.name = 'time'
     return df_cor
 
-def get_kde_pdf(X, bandwidth=2, step=.1, num_samples=200, optimize=False):
+def get_cor_sec(df_meet_sec):
+    """
+    return df of the correlations between all users within each second, in the same layout as
+    df_meet_sec.groupby(df_meet_sec.index).corr().
+    """
+    gps = df_meet_sec.groupby(df_meet_sec.index)
+    return _get_cor_sec(df_meet_sec, gps.ngroup().values, gps.mean())
+
+def _get_cor_sec(df_meet_sec, secs_idx, df_mean):
     """
-    return kde and pdf from a data sample
+    get_cor_sec, given the position of each sample's second (secs_idx) and the means of the seconds
+    (df_mean), so that they can be shared with other per-second statistics
+    """
+    n = df_meet_sec.shape[1]
+    secs = df_mean.index
+    ## center the samples within each second, and sum the products of every pair of users; the
+    ## deviations are stored by column, so that the samples of each user are contiguous
+    dev = np.asfortranarray(df_meet_sec.values - df_mean.values[secs_idx])
+    cov = np.empty((len(secs), n, n))
+    for i, j in itertools.combinations_with_replacement(range(n), 2):
+        cov[:, i, j] = cov[:, j, i] = np.bincount(secs_idx, weights=dev[:, i] * dev[:, j], minlength=len(secs))
+    var = np.diagonal(cov, axis1=1, axis2=2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cors = (cov / np.sqrt(var[:, :, None] * var[:, None, :])).reshape(len(secs) * n, n)
+    ## pandas correlates the seconds with missing samples over pairwise complete observations
+    has_nan = df_meet_sec.isnull().values.any(axis=1)
+    if has_nan.any():
+        df_nan = df_meet_sec[df_meet_sec.index.isin(df_meet_sec.index[has_nan])]
+        pos = secs.get_indexer(df_nan.index.unique().sort_values())
+        cors[(pos[:, None] * n + np.arange(n)).ravel()] = df_nan.groupby(df_nan.index).corr().values
+    index = pd.MultiIndex.from_product([secs, df_meet_sec.columns],
+                                       names=[df_meet_sec.index.name, df_meet_sec.columns.name])
+    return pd.DataFrame(cors, index=index, columns=df_meet_sec.columns)
+
+## evaluation grids of the pdfs, by step
+_GRID_CACHE = {}
+
+def _get_grid(step):
+    """
+    return the (cached) evaluation grid of the pdfs, as a column vector
+    """
+    if step not in _GRID_CACHE:
+        _GRID_CACHE[step] = np.arange(0, 100, step)[:, None]
+    return _GRID_CACHE[step]
+
+def get_kde_pdf(X, bandwidth=2, step=.1, num_samples=200, optimize=False, grid=None, with_samples=True):
+    """
+    return kde and pdf from a data sample, and samples drawn from the kde (None if not with_samples)
     """
     if len(X) ==0 :
         return [],np.array([]),[]
     if optimize:
         bandwidths = 10 ** np.linspace(-1, 1, 10)
-        grid = GridSearchCV(KernelDensity(kernel='gaussian'), {'bandwidth': bandwidths}, 
-                            cv=LeaveOneOut(len(X)))
-        grid.fit(X[:, None]);
-        kde = KernelDensity(kernel='gaussian', bandwidth=grid.best_params_['bandwidth']).fit(X[:,None])    
+        search = GridSearchCV(KernelDensity(kernel='gaussian'), {'bandwidth': bandwidths}, 
+                              cv=LeaveOneOut(len(X)))
+        search.fit(X[:, None]);
+        kde = KernelDensity(kernel='gaussian', bandwidth=search.best_params_['bandwidth']).fit(X[:,None])    
     else:
         kde = KernelDensity(kernel='gaussian', bandwidth=2).fit(X[:,None]) 
-    pdf = np.exp( kde.score_samples(np.arange(0, 100, step)[:,None]) )
-    samples = kde.sample(num_samples)            
+    if grid is None:
+        grid = _get_grid(step)
+    pdf = np.exp( kde.score_samples(grid) )
+    samples = kde.sample(num_samples) if with_samples else None
     return kde, np.array(pdf), samples
 
+def _fftkde_pdfs(Xs, bandwidth=2, step=.1):
+    """
+    return the pdfs of gaussian kdes of data samples on np.arange(0, 100, step), one row per
+    sample, computed by binning the samples on a shared grid and convolving them all with the
+    kernel at once (with FFT). the binning is an approximation of the exact kde: its error stays
+    below (step / bandwidth) ** 2 / 8 of the peak density, i.e. 3e-4 with the defaults
+    """
+    Xs = [np.asarray(X, dtype=float).ravel() for X in Xs]
+    num_points = len(_get_grid(step))
+    ## the binning grid covers the evaluation grid, the samples, and the kernel's reach around them
+    reach = int(np.ceil(5 * bandwidth / step))
+    first = int(np.floor(min([0] + [X.min() for X in Xs]) / step)) - reach
+    last = int(np.ceil(max([num_points * step] + [X.max() for X in Xs]) / step)) + reach
+    ## linear binning: each point is split between its two nearest grid nodes
+    hists = np.zeros((len(Xs), last - first + 2))
+    for hist, X in zip(hists, Xs):
+        pos = (X - first * step) / step
+        left = np.floor(pos).astype(int)
+        frac = pos - left
+        hist += np.bincount(left, weights=(1 - frac) / len(X), minlength=len(hist)) \
+              + np.bincount(left + 1, weights=frac / len(X), minlength=len(hist))
+    offsets = np.arange(-reach, reach + 1) * step
+    kernel = np.exp(-0.5 * (offsets / bandwidth) ** 2) / (bandwidth * np.sqrt(2 * np.pi))
+    pdfs = signal.fftconvolve(hists, kernel[None, :], mode='same')[:, -first:num_points - first]
+    return np.maximum(pdfs, 0)
+
+def get_sep(pns, pys, prox=0.001, step=0.1):
+    """
+    return the cut-off point of a user, i.e. the last point where the talking pdf (pys) rises
+    above the silent pdf (pns), ignoring the densities below prox.  Returns -1 if there is none.
+    """
+    pns = np.where(pns > prox, pns, 0)
+    pys = np.where(pys > prox, pys, 0)
+    crossings = np.flatnonzero((pys[:-1] < pns[:-1]) & (pys[1:] >= pns[1:]))
+    return (crossings[-1] + 1) * step if len(crossings) > 0 else -1
+
 def get_seps(dt_nys, prox=0.001, step=0.1, num_samples=200, bandwidth=2):
     """
     return cut-off points for all users
@@ -77,23 +173,28 @@ def get_seps(dt_nys, prox=0.001, step=0.1, num_samples=200, bandwidth=2):
     for idx, user in enumerate(dt_nys):
         ns, ys = dt_nys[user]
         cond_nonezero = len(ns)==0 or len(ys)==0
-        kden, pns, nss = get_kde_pdf(ns, bandwidth, step, num_samples)
-        kdey, pys, yss = get_kde_pdf(ys, bandwidth, step, num_samples)       
-        
-        pys[pys<=prox] = 0
-        pns[pns<=prox] = 0
-
-        sep = -1        
-        if not cond_nonezero:
-            for i in np.arange(int(100/step)-1, 0, -1):
-                if pys[i-1] < pns[i-1]  and pys[i] >= pns[i]:
-                    sep = i * step
-                    break        
-        seps.append(sep)
+        if cond_nonezero:
+            seps.append(-1)
+            continue
+        ## only the pdfs are needed here, so both are estimated together with FFT rather than sklearn.
+        ## like in get_kde_pdf (and so get_kldistance), the bandwidth of the kdes is 2, whatever bandwidth is
+        pns, pys = _fftkde_pdfs([ns, ys], 2, step)
+        seps.append(get_sep(pns, pys, prox, step))
     seps = np.array(seps)
     seps[seps == -1] = seps[seps != -1].mean()
     return seps
 
+def get_kldivergences(pns_all, pys_all):
+    """
+    return the kl-divergences between each row of pns_all and the same row of pys_all,
+    like scipy.stats.entropy(pns, pys) does for a single pair of distributions
+    """
+    pns_all = pns_all / pns_all.sum(axis=1, keepdims=True)
+    pys_all = pys_all / pys_all.sum(axis=1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        terms = np.where(pns_all > 0, pns_all * np.log(pns_all / pys_all), 0)
+    return terms.sum(axis=1)
+
 def get_kldistance(dt_nys, bandwidth=2, prox=0.001, step=0.1, num_samples=200, plot=False, figsize=(12,8)):
     """
     only for 4-user situations
@@ -103,34 +204,42 @@ def get_kldistance(dt_nys, bandwidth=2, prox=0.001, step=0.1, num_samples=200, p
     if plot is True:
         fig, axs = plt.subplots(2,2,figsize=figsize,) 
         plt.tight_layout(h_pad=4)
-    for idx, user in enumerate(dt_nys):
+    grid = _get_grid(step)
+    users = list(dt_nys)
+    pdfs, samples = [], []
+    for user in users:
         ns, ys = dt_nys[user]
         cond_nonezero = len(ns) == 0 or len(ys) ==0
-        kden, pns, nss = get_kde_pdf(ns, step=step, num_samples=num_samples, bandwidth=bandwidth)
-        kdey, pys, yss = get_kde_pdf(ys, step=step, num_samples=num_samples, bandwidth=bandwidth)
-        
-        kldistance = stats.entropy(pns, pys) if not cond_nonezero else np.nan
-        if not np.isinf(kldistance) and not np.isnan(kldistance):
-            klds.append(kldistance)
-
-        pys[pys<=prox] = 0
-        pns[pns<=prox] = 0
-
-        sep = -1        
-        if not cond_nonezero:
-            for i in np.arange(int(100/step)-1, 0, -1):
-                if pys[i-1] < pns[i-1]  and pys[i] >= pns[i]:
-                    sep = i * step
-                    break
+        ## the samples are only drawn for the plots
+        kden, pns, nss = get_kde_pdf(ns, step=step, num_samples=num_samples, bandwidth=bandwidth, grid=grid,
+                                     with_samples=plot)
+        kdey, pys, yss = get_kde_pdf(ys, step=step, num_samples=num_samples, bandwidth=bandwidth, grid=grid,
+                                     with_samples=plot)
+        pdfs.append((pns, pys) if not cond_nonezero else None)
+        samples.append((nss, yss))
+
+        sep = get_sep(pns, pys, prox, step) if not cond_nonezero else -1
         seps.append(sep)
-        
-        if plot is True:
+
+    ## the kl-distances of all the users with both distributions are computed at once
+    kldistances = np.full(len(users), np.nan)
+    has_pdfs = np.array([p is not None for p in pdfs], dtype=bool)
+    if has_pdfs.any():
+        pns_all, pys_all = (np.vstack(ps) for ps in zip(*[p for p in pdfs if p is not None]))
+        kldistances[has_pdfs] = get_kldivergences(pns_all, pys_all)
+    klds.extend(kldistances[np.isfinite(kldistances)])
+
+    if plot is True:
+        for idx, user in enumerate(users):
+            nss, yss = samples[idx]
+            kldistance = kldistances[idx]
+            sep = seps[idx]
             ax = axs.flatten()[idx]
             sns.distplot(nss, label='Silent',  kde=False, norm_hist=True, ax=ax)
             sns.distplot(yss, label='Talking', kde=False, norm_hist=True, ax=ax)
             ax.set_title('%s kl-dist:%.2f' % (user, kldistance) )    
             ax.set_xlabel('')
-            if not cond_nonezero:
+            if pdfs[idx] is not None:
                 ax.axvline(x=sep)
                 ax.annotate('best sep val: %.1f' % sep, xy=(sep, 0.1), xytext=(sep+5, 0.1), 
                         arrowprops= dict(facecolor='black', shrink=0.0001))
@@ -145,10 +254,13 @@ def get_ts_distribution(df_meet, df_spk):
     get distributions for all subjects when they talk or keep silent
     """
     dt_nys = {}
+    ## hash the speakers once, then split each user's column on the integer codes
+    spk_codes, speakers = pd.factorize(df_spk.speaker)
+    speakers = pd.Index(speakers)
     for user in df_meet.columns:
-        ns = df_spk.loc[df_spk.speaker != user][user]
-        ys = df_spk.loc[df_spk.speaker == user][user]
-        dt_nys[user] = [ns, ys]
+        is_spk = spk_codes == (speakers.get_loc(user) if user in speakers else len(speakers))
+        ts = df_spk[user]
+        dt_nys[user] = [ts[~is_spk], ts[is_spk]]
     return dt_nys
 
 def get_spk_genuine(df_meet, thre):
@@ -156,19 +268,22 @@ def get_spk_genuine(df_meet, thre):
     get genuine spk
     """
     df_meet_sec = get_meet_sec(df_meet)
-    df_cor = df_meet_sec.groupby(df_meet_sec.index).corr().dropna()
+    ## group once, and share the grouping and the means with the correlations
+    gps = df_meet_sec.groupby(df_meet_sec.index)
+    df_mean_ori = gps.mean()
+    df_std_ori = gps.std()
+    df_cor = _get_cor_sec(df_meet_sec, gps.ngroup().values, df_mean_ori).dropna()
     df_cor = pd.DataFrame((df_cor >= thre).T.all())
     df_cor.reset_index(inplace=True)
     df_cor.columns = ['datetime', 'member', 'val']
     ## Find those people whoes correlation with others are all higher than thre
     df_cor = df_cor.pivot(index='datetime', columns='member', values='val')
-    df_mean_ori = df_meet_sec.groupby(df_meet_sec.index).agg(np.mean)
-    df_std_ori = df_meet_sec.groupby(df_meet_sec.index).agg(np.std)
     df_mean = pd.DataFrame(df_mean_ori.T.idxmax(), columns=['speaker'])
     ## combine 'correlation' and 'volume' to locate the speaker
     df_comb = df_mean.merge(df_cor, left_index=True, right_index=True)
     ## df_comb_sel contains the speaker information 
-    idx = [df_comb.ix[i, u ] for i,u in enumerate(df_comb.speaker)]
+    df_comb_val = df_comb.drop('speaker', axis=1)
+    idx = df_comb_val.values[np.arange(len(df_comb)), df_comb_val.columns.get_indexer(df_comb.speaker)].astype(bool)
     df_comb_sel = df_comb[idx][['speaker']]
     ## get speakers' mean
     df_spk_mean = df_comb_sel.merge(df_mean_ori, left_index=True, right_index=True)
@@ -181,8 +296,10 @@ def get_spk_all(df_flt, df_spk_mean, df_spk_std, bandwidth=2):
     get all spk
     """
     df_flt_sec = get_meet_sec(df_flt)
-    gps_mean = df_flt_sec.groupby(df_flt_sec.index).mean()
-    gps_std = df_flt_sec.groupby(df_flt_sec.index).std()
+    ## group once, and reuse the grouping for both statistics
+    gps = df_flt_sec.groupby(df_flt_sec.index)
+    gps_mean = gps.mean()
+    gps_std = gps.std()
     speak_all = [] 
     nys_mean = get_ts_distribution(df_flt, df_spk_mean)
     nys_std = get_ts_distribution(df_flt, df_spk_std)
@@ -211,7 +328,8 @@ def get_spk_real(df_flt, df_speak_all, thre):
     """
     df_mean_raw = df_speak_all[df_speak_all.index.duplicated(keep = False)].sort_index()
     df_mean_raw.reset_index(inplace=True)
-    vals = [df_mean_raw.ix[i, u ] for i, u in enumerate(df_mean_raw.speaker)]
+    df_mean_val = df_mean_raw.drop(['datetime', 'speaker'], axis=1)
+    vals = df_mean_val.values[np.arange(len(df_mean_raw)), df_mean_val.columns.get_indexer(df_mean_raw.speaker)]
     df_mean_sel = df_mean_raw[['datetime', 'speaker',]]
     df_mean_sel['val'] = vals
     df_mean = df_mean_sel.pivot(index='datetime', columns='speaker', values='val')
@@ -220,11 +338,18 @@ def get_spk_real(df_flt, df_speak_all, thre):
     df_mean.columns = volume_spks
     df_meet_sec = get_meet_sec(df_flt)
     ## Notie: dropna() will cause true speakers to be ignored. use fillna instead.
-    df_cor = df_meet_sec.groupby(df_meet_sec.index).corr().fillna(2)
+    df_cor = get_cor_sec(df_meet_sec).fillna(2)
     df_comb = df_mean.merge(df_cor, left_index=True, right_index=True)
-    ## I know it is hard to read... I just do not want to write for loop
-    # the logic is: it returns true only when the correlation with those guys with higher volume are all smaller than the threshold
-    idxs_mean = [ False if u not in potential_spks or np.isnan(df_comb.ix[i]['%s_vol' % u]) else (df_comb.ix[i][ df_comb.ix[i][volume_spks][df_comb.ix[i][volume_spks] > df_comb.ix[i]['%s_vol' % u]].index.map(lambda x: x.rstrip('_vol'))] < thre).all() for i, u in enumerate(df_comb.index.get_level_values('member'))]
+    ## a row is kept only when the correlations of its member with those guys with higher volume are all
+    # smaller than the threshold. rows of members that are not potential speakers, or without volume, are dropped
+    vols = df_comb[volume_spks].values
+    cors = df_comb[potential_spks].values
+    member_idx = pd.Index(potential_spks).get_indexer(df_comb.index.get_level_values('member'))
+    rows = np.arange(len(df_comb))
+    member_vols = np.where(member_idx >= 0, vols[rows, member_idx], np.nan)
+    with np.errstate(invalid='ignore'):
+        louder = vols > member_vols[:, None]
+    idxs_mean = ~np.isnan(member_vols) & ((cors < thre) | ~louder).all(axis=1)
     df_ms = df_comb[idxs_mean]
     target_cols = ['member']
     target_cols.extend(volume_spks)
@@ -1,11 +1,20 @@
 from __future__ import absolute_import, division, print_function
 
 import pandas as pd
+import numpy as np
 import re
 import ast
+import collections
+import array
 
 log_pattern = re.compile("^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d+ - \w+ - .*$")
 
+# ANSI escape sequences (colors) found in the logs
+ansi_escape_pattern = re.compile(r'\x1B\[[0-?]*[ -/]*[@-~]')
+
+# Characters removed from the advertisement payload to shorten it
+adv_payload_strip_pattern = re.compile('[ :\'\[]')
+
 
 def _is_legal_log_line(line):
     return log_pattern.match(line) is not None
@@ -28,8 +37,7 @@ def _hublog_read_scan_line(line):
 
     """
     # Removing ANSI from line (colors)
-    ansi_escape = re.compile(r'\x1B\[[0-?]*[ -/]*[@-~]')
-    line = ansi_escape.sub('', line)
+    line = ansi_escape_pattern.sub('', line)
 
     # remove end of line
     line = line.rstrip("\n\r")
@@ -38,9 +46,9 @@ def _hublog_read_scan_line(line):
     if not _is_legal_log_line(line):
         return None
 
-
     # parse
-    data = line.split(" - ")[2]
+    fields = line.split(" - ")
+    data = fields[2]
 
     if not data.startswith("Found"):
         return None
@@ -62,8 +70,8 @@ def _hublog_read_scan_line(line):
     scan_data.update(adv_payload)
     scan_data['mac'] = data.split(" ")[1][0:-1]
     scan_data['rssi'] = data.split(": ")[2].split(",")[0]
-    scan_data['datetime'] = line.split(" - ")[0]
-    scan_data['adv_payload'] = re.sub('[ :\'\[]', '', adv_payload_raw)  # shortenning it
+    scan_data['datetime'] = fields[0]
+    scan_data['adv_payload'] = adv_payload_strip_pattern.sub('', adv_payload_raw)  # shortenning it
     return scan_data
 
 
@@ -88,26 +96,35 @@ def hublog_scans(fileobject, log_tz, tz='US/Eastern'):
     """
 
     def readfile(fileobject):
+        # The rssi are accumulated in a typed array, and the other fields in one list per column,
+        # rather than as a list of tuples
+        columns = collections.OrderedDict([
+            ('datetime', []),
+            ('mac', []),
+            ('rssi', array.array('d')),
+            ('voltage', []),
+            ('badge_id', []),
+            ('project_id', []),
+            ('sync_status', []),
+            ('audio_status', []),
+            ('proximity_status', []),
+        ])
+
         for line in fileobject:
-            line_num = line_num + 1
             data = _hublog_read_scan_line(line)
-            if data:
-                yield (data['datetime'],
-                       str(data['mac']),
-                       float(data['rssi']),
-                       data['voltage'],
-                       data['badge_id'],
-                       data['project_id'],
-                       data['sync_status'],
-                       data['audio_status'],
-                       data['proximity_status'],
-                       )
-            else:
+            if not data:
                 continue  # skip unneeded lines
 
-    df = pd.DataFrame(readfile(fileobject), columns=['datetime', 'mac', 'rssi', 'voltage', 'badge_id', \
-                                                     'project_id', 'sync_status', 'audio_status', \
-                                                     'proximity_status'])
+            columns['datetime'].append(data['datetime'])
+            columns['mac'].append(str(data['mac']))
+            columns['rssi'].append(float(data['rssi']))
+            for name in ('voltage', 'badge_id', 'project_id', 'sync_status', 'audio_status', 'proximity_status'):
+                columns[name].append(data[name])
+
+        columns['rssi'] = np.frombuffer(columns['rssi'], dtype=np.float64)
+        return pd.DataFrame(columns)
+
+    df = readfile(fileobject)
 
     # Localized record date
     df['datetime'] = pd.to_datetime(df['datetime'], utc=True) \
@@ -173,16 +190,23 @@ def hublog_resets(fileobject, log_tz, tz='US/Eastern'):
         A record with mac and timestamp
     """
     def readfile(fileobject):
+        # The fields are accumulated in one list per column, rather than as a list of tuples
+        columns = collections.OrderedDict([
+            ('datetime', []),
+            ('mac', []),
+        ])
+
         for line in fileobject:
             data = _hublog_read_reset_line(line)
-            if data:
-                yield (data['datetime'],
-                       str(data['mac']),
-                       )
-            else:
+            if not data:
                 continue  # skip unneeded lines
 
-    df = pd.DataFrame(readfile(fileobject), columns=['datetime', 'mac'])
+            columns['datetime'].append(data['datetime'])
+            columns['mac'].append(str(data['mac']))
+
+        return pd.DataFrame(columns)
+
+    df = readfile(fileobject)
 
     # Localized record date
     df['datetime'] = pd.to_datetime(df['datetime'], utc=True) \
@@ -247,17 +271,25 @@ def hublog_clock_syncs(fileobject, log_tz, tz='US/Eastern'):
     """
 
     def readfile(fileobject):
+        # The fields are accumulated in one list per column, rather than as a list of tuples
+        columns = collections.OrderedDict([
+            ('datetime', []),
+            ('mac', []),
+            ('badge_timestamp', []),
+        ])
+
         for line in fileobject:
             data = _hublog_read_clock_sync_line(line)
-            if data:
-                yield (data['datetime'],
-                       str(data['mac']),
-                       str(data['badge_timestamp']),
-                       )
-            else:
+            if not data:
                 continue  # skip unneeded lines
 
-    df = pd.DataFrame(readfile(fileobject), columns=['datetime', 'mac', 'badge_timestamp'])
+            columns['datetime'].append(data['datetime'])
+            columns['mac'].append(str(data['mac']))
+            columns['badge_timestamp'].append(str(data['badge_timestamp']))
+
+        return pd.DataFrame(columns)
+
+    df = readfile(fileobject)
 
     # Localized record date
     df['datetime'] = pd.to_datetime(df['datetime'], utc=True) \
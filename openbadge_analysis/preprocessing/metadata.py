@@ -1,7 +1,9 @@
 import pandas as pd
-import json
 import io
-from ..core import mac_address_to_id
+import collections
+import array
+from ..core import mac_address_to_id, json_loads, _iter_lines, _timestamps_to_datetimes, _time_bins_grouper, \
+    _read_logs, _columns_to_dataframe
 
 def _id_to_member_mapping_fill_gaps(idmap, time_bins_size='1min'):
     """ Fill gaps in a idmap
@@ -19,7 +21,7 @@ def _id_to_member_mapping_fill_gaps(idmap, time_bins_size='1min'):
     """
     df = idmap.to_frame().reset_index()
     df.set_index('datetime', inplace=True)
-    s = df.groupby(['id'])['member'].resample(time_bins_size).fillna(method='ffill')
+    s = df.groupby(['id'], sort=False)['member'].resample(time_bins_size).fillna(method='ffill')
     s = s.reorder_levels((1,0)).sort_index()
     return s
 
@@ -52,33 +54,49 @@ def legacy_id_to_member_mapping(fileobject, time_bins_size='1min', tz='US/Easter
     """
     
     def readfile(fileobject):
-        no_id_warning = False
-        for line in fileobject:
-            data = json.loads(line)['data']
+        # The values are accumulated column by column, rather than as a list
+        # of tuples that pandas would then have to transpose
+        columns = collections.OrderedDict([
+            ('timestamp', array.array('d')),
+            ('id', []),
+            ('member', []),
+        ])
+
+        # Rows without an id, and their MAC addresses, to be converted after the loop
+        missing_id_rows = []
+        missing_id_addresses = []
+
+        for line in _iter_lines(fileobject):
+            data = json_loads(line)['data']
             member_id = None
             if 'member_id' in data:
                 member_id = data['member_id']
             else:
-                member_id = mac_address_to_id(data['badge_address'])
-                if not no_id_warning:
-                    print("Warning - no id provided in data. Calculating id from MAC address")
-                no_id_warning = True
-
-            yield (data['timestamp'],
-                   member_id,
-                   str(data['member']))
+                missing_id_rows.append(len(columns['id']))
+                missing_id_addresses.append(data['badge_address'])
+
+            columns['timestamp'].append(data['timestamp'])
+            columns['id'].append(member_id)
+            columns['member'].append(str(data['member']))
+
+        # Compute the missing ids, once per distinct address
+        if missing_id_rows:
+            print("Warning - no id provided in data. Calculating id from MAC address")
+            ids = {address: mac_address_to_id(address) for address in set(missing_id_addresses)}
+            for row, address in zip(missing_id_rows, missing_id_addresses):
+                columns['id'][row] = ids[address]
+
+        return _columns_to_dataframe(columns)
     
-    df = pd.DataFrame(readfile(fileobject), columns=['timestamp', 'id', 'member'])
+    df = readfile(fileobject)
     # Convert the timestamp to a datetime, localized in UTC
-    df['datetime'] = pd.to_datetime(df['timestamp'], unit='s', utc=True) \
-            .dt.tz_localize('UTC').dt.tz_convert(tz)
-    del df['timestamp']
+    df['datetime'] = _timestamps_to_datetimes(df.pop('timestamp').values, tz)
 
     # Group by id and resample
     df = df.groupby([
-        pd.TimeGrouper(time_bins_size, key='datetime'),
+        _time_bins_grouper(df, time_bins_size),
         'id'
-    ]).first()
+    ], sort=False).first()
 
     # Extract series
     s = df.sort_index()['member']
@@ -124,6 +142,67 @@ def id_to_member_mapping(mapper, time_bins_size='1min', tz='US/Eastern', fill_ga
         raise ValueError("You must provide either a fileobject or metadata dataframe as the mapper.")
 
 
+def _read_voltages(fileobject, skip_errors=False):
+    """Reads the voltages of a proximity or audio data file.
+    See `voltages`.
+    """
+    columns = collections.OrderedDict([
+        ('timestamp', array.array('d')),
+        ('member', []),
+        ('voltage', array.array('d')),
+    ])
+
+    i = 0
+    for line in _iter_lines(fileobject):
+        i = i + 1
+        try:
+            data = json_loads(line)['data']
+
+            # All the values are parsed before any is appended, so that a
+            # skipped line does not leave the columns with different lengths
+            row = (data['timestamp'],
+                   str(data['member']),
+                   float(data['voltage']))
+        except:
+            print("Error in line#:", i, line)
+            if skip_errors:
+                continue
+            else:
+                raise
+
+        for values, value in zip(columns.values(), row):
+            values.append(value)
+
+    return _columns_to_dataframe(columns)
+
+
+def _voltages(df, time_bins_size, tz):
+    """Bins the voltages returned by `_read_voltages`.
+    See `voltages`.
+    """
+    # Convert the timestamp to a datetime, localized in UTC
+    df['datetime'] = _timestamps_to_datetimes(df.pop('timestamp').values, tz)
+
+    # Replace the member names by integer codes, so that the grouping below
+    # does not have to hash strings.  The codes are sorted, so that they
+    # preserve the order of the names.
+    member_codes, members = pd.factorize(df['member'], sort=True)
+    df['member'] = member_codes
+
+    # Group by id and resample
+    df = df.groupby([
+        _time_bins_grouper(df, time_bins_size),
+        'member'
+    ], sort=False).mean()
+    
+    df.sort_index(inplace=True)
+
+    # Put the member names back in the index
+    df.index = df.index.set_levels(members[df.index.levels[1]], level='member')
+    
+    return df['voltage']
+
+
 def voltages(fileobject, time_bins_size='1min', tz='US/Eastern', skip_errors=False):
     """Creates a DataFrame of voltages, for each member and time bin.
     
@@ -146,40 +225,112 @@ def voltages(fileobject, time_bins_size='1min', tz='US/Eastern', skip_errors=Fal
     pd.Series :
         Voltages, indexed by datetime and member.
     """
-    
-    def readfile(fileobject, skip_errors):
-        i = 0
-        for line in fileobject:
-            i = i + 1
-            try:
-                data = json.loads(line)['data']
-
-                yield (data['timestamp'],
-                       str(data['member']),
-                       float(data['voltage']))
-            except:
-                print("Error in line#:", i, line)
-                if skip_errors:
-                    continue
-                else:
-                    raise
-
-    df = pd.DataFrame(readfile(fileobject, skip_errors), columns=['timestamp', 'member', 'voltage'])
 
+    return _voltages(_read_voltages(fileobject, skip_errors), time_bins_size, tz)
+
+
+def voltages_from_logs(logs, time_bins_size='1min', tz='US/Eastern', skip_errors=False, n_jobs=1,
+                       cache_dir=None):
+    """Creates a DataFrame of voltages, for each member and time bin, from several data files.
+
+    The files can be read in parallel, and their voltages are binned together, as if
+    the files had been concatenated.
+
+    Parameters
+    ----------
+    logs : list of str
+        Paths to the proximity or audio data files.
+
+    time_bins_size : str
+        The size of the time bins used for resampling.  Defaults to '1min'.
+
+    tz : str
+        The time zone used for localization of dates.  Defaults to 'US/Eastern'.
+
+    skip_errors : boolean
+        If set to True, skip errors in the data files
+
+    n_jobs : int or None
+        The number of processes used to read the files.  Defaults to 1, i.e. the files
+        are read one after the other.  If None, uses all the CPUs.
+
+    cache_dir : str or None
+        A directory where the parsed files are cached, as numpy .npz files of their columns,
+        so that later calls do not parse them again, unless they changed.  Defaults to None,
+        i.e. no caching.
+
+    Returns
+    -------
+    pd.Series :
+        Voltages, indexed by datetime and member.
+    """
+
+    dfs = _read_logs(logs, _read_voltages, n_jobs=n_jobs, cache_dir=cache_dir, skip_errors=skip_errors)
+    if len(dfs) == 0:
+        dfs = [_read_voltages([])]
+
+    return _voltages(pd.concat(dfs, ignore_index=True), time_bins_size, tz)
+
+
+def _read_sample_counts(fileobject, skip_errors=False):
+    """Reads the sample counts of a proximity or audio data file.
+    See `sample_counts`.
+    """
+    columns = collections.OrderedDict([
+        ('timestamp', array.array('d')),
+        ('type', []),
+        ('member', []),
+        ('cnt', array.array('l')),
+    ])
+
+    i = 0
+    for line in _iter_lines(fileobject):
+        i = i + 1
+        try:
+            raw_data = json_loads(line)
+            data = raw_data['data']
+            type = raw_data['type']
+
+            if type == 'proximity received':
+                cnt = len(data['rssi_distances'])
+            elif type == 'audio received':
+                cnt = len(data['samples'])
+            else:
+                cnt = -1
+
+            # cnt is always an int already, so it is not cast
+            row = (data['timestamp'],
+                   str(type),
+                   str(data['member']),
+                   cnt)
+        except:
+            print("Error in line#:", i, line)
+            if skip_errors:
+                continue
+            else:
+                raise
+
+        for values, value in zip(columns.values(), row):
+            values.append(value)
+
+    return _columns_to_dataframe(columns)
+
+
+def _sample_counts(df, tz, keep_type):
+    """Indexes the sample counts returned by `_read_sample_counts`.
+    See `sample_counts`.
+    """
     # Convert the timestamp to a datetime, localized in UTC
-    df['datetime'] = pd.to_datetime(df['timestamp'], unit='s', utc=True) \
-                       .dt.tz_localize('UTC').dt.tz_convert(tz)
-    del df['timestamp']
+    df['datetime'] = _timestamps_to_datetimes(df.pop('timestamp').values, tz)
 
-    # Group by id and resample
-    df = df.groupby([
-        pd.TimeGrouper(time_bins_size, key='datetime'),
-        'member'
-    ]).mean()
-    
+    if keep_type:
+        df.set_index(['datetime','type','member'],inplace=True)
+    else:
+        del df['type']
+        df.set_index(['datetime', 'member'], inplace=True)
     df.sort_index(inplace=True)
-    
-    return df['voltage']
+
+    return df
 
 
 def sample_counts(fileobject, tz='US/Eastern', keep_type=False, skip_errors=False):
@@ -205,46 +356,46 @@ def sample_counts(fileobject, tz='US/Eastern', keep_type=False, skip_errors=Fals
         Counts, indexed by datetime, type and member.
     """
 
-    def readfile(fileobject, skip_errors=False):
-        i = 0
-        for line in fileobject:
-            i = i + 1
-            try:
-                raw_data = json.loads(line)
-                data = raw_data['data']
-                type = raw_data['type']
-
-                if type == 'proximity received':
-                    cnt = len(data['rssi_distances'])
-                elif type == 'audio received':
-                    cnt = len(data['samples'])
-                else:
-                    cnt = -1
-
-                yield (data['timestamp'],
-                       str(type),
-                       str(data['member']),
-                       int(cnt))
-            except:
-                print("Error in line#:", i, line)
-                if skip_errors:
-                    continue
-                else:
-                    raise
-
-    df = pd.DataFrame(readfile(fileobject, skip_errors), columns=['timestamp' ,'type', 'member',
-                                                     'cnt'])
+    return _sample_counts(_read_sample_counts(fileobject, skip_errors), tz, keep_type)
 
-    # Convert the timestamp to a datetime, localized in UTC
-    df['datetime'] = pd.to_datetime(df['timestamp'], unit='s', utc=True) \
-        .dt.tz_localize('UTC').dt.tz_convert(tz)
-    del df['timestamp']
 
-    if keep_type:
-        df.set_index(['datetime','type','member'],inplace=True)
-    else:
-        del df['type']
-        df.set_index(['datetime', 'member'], inplace=True)
-    df.sort_index(inplace=True)
+def sample_counts_from_logs(logs, tz='US/Eastern', keep_type=False, skip_errors=False, n_jobs=1,
+                            cache_dir=None):
+    """Creates a DataFrame of sample counts, for each member and raw record, from several data files.
 
-    return df
+    The files can be read in parallel.
+
+    Parameters
+    ----------
+    logs : list of str
+        Paths to the proximity or audio data files.
+
+    tz : str
+        The time zone used for localization of dates.  Defaults to 'US/Eastern'.
+
+    keep_type : boolean
+        If set to True, the type of the record will be returned as well
+
+    skip_errors : boolean
+        If set to True, skip errors in the data files
+
+    n_jobs : int or None
+        The number of processes used to read the files.  Defaults to 1, i.e. the files
+        are read one after the other.  If None, uses all the CPUs.
+
+    cache_dir : str or None
+        A directory where the parsed files are cached, as numpy .npz files of their columns,
+        so that later calls do not parse them again, unless they changed.  Defaults to None,
+        i.e. no caching.
+
+    Returns
+    -------
+    pd.Series :
+        Counts, indexed by datetime, type and member.
+    """
+
+    dfs = _read_logs(logs, _read_sample_counts, n_jobs=n_jobs, cache_dir=cache_dir, skip_errors=skip_errors)
+    if len(dfs) == 0:
+        dfs = [_read_sample_counts([])]
+
+    return _sample_counts(pd.concat(dfs, ignore_index=True), tz, keep_type)
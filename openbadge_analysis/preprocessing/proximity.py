@@ -1,6 +1,111 @@
 import pandas as pd
-import json
+import numpy as np
 import collections
+import array
+import itertools
+import operator
+from ..core import json_loads, _iter_lines, _timestamps_to_datetimes, _dedup_period, \
+    _time_bins_grouper, _time_bin_starts, _read_logs, _columns_to_dataframe
+
+def _read_member_to_badge_proximity(fileobject):
+    """Reads the observations of a proximity data file.
+
+    Parameters
+    ----------
+    fileobject : file or iterable list of str
+        The proximity data, as an iterable of JSON strings.
+
+    Returns
+    -------
+    (pd.DataFrame, np.ndarray) :
+        The observations, with their members as codes, and the member names, indexed by code.
+    """
+    # The numeric columns are accumulated in typed arrays, rather than as a
+    # list of tuples, to avoid allocating a Python object for every value
+    columns = collections.OrderedDict([
+        ('timestamp', array.array('d')),
+        ('member', array.array('l')),
+        ('observed_id', []),
+        ('rssi', array.array('d')),
+        ('count', array.array('d')),
+    ])
+
+    # The members are numbered in order of appearance, so that each observation
+    # only stores the code of its member.  They are only converted to str once
+    # per distinct member, after reading the file (the codes of values with the
+    # same str are merged later, with the names)
+    member_codes = {}
+    members = []
+
+    # The observations of each line are added column by column.  The values are
+    # streamed into the columns, without building a temporary list per line
+    get_rssi = operator.itemgetter('rssi')
+    get_count = operator.itemgetter('count')
+    for line in _iter_lines(fileobject):
+        data = json_loads(line)['data']
+        rssi_distances = data['rssi_distances']
+        n = len(rssi_distances)
+
+        columns['timestamp'].extend(itertools.repeat(data['timestamp'], n))
+        member = data['member']
+        if member not in member_codes:
+            member_codes[member] = len(members)
+            members.append(member)
+
+        columns['member'].extend(itertools.repeat(member_codes[member], n))
+        columns['observed_id'].extend(rssi_distances.keys())
+        columns['rssi'].extend(map(get_rssi, rssi_distances.values()))
+        columns['count'].extend(map(get_count, rssi_distances.values()))
+
+    # The observed ids are parsed all at once, rather than with one int() call per observation
+    columns['observed_id'] = np.array(columns['observed_id']).astype(np.int64)
+
+    # The rssi (in dBm) and the counts are stored in single precision, which halves their memory,
+    # whatever their values: single precision holds the integers reported by the badges exactly,
+    # and unlike small integer types it does not overflow in arithmetic, and has NaN
+    columns['rssi'] = np.frombuffer(columns['rssi']).astype(np.float32)
+    columns['count'] = np.frombuffer(columns['count']).astype(np.float32)
+
+    df = _columns_to_dataframe(columns)
+    return df, np.array([str(member) for member in members], dtype=object)
+
+
+def _member_to_badge_proximity(df, members, time_bins_size, tz):
+    """Bins the observations returned by `_read_member_to_badge_proximity`.
+    See `member_to_badge_proximity`.
+    """
+    # The members are identified by integer codes, so that the grouping below
+    # does not have to hash strings.  The codes are renumbered in the order of
+    # the names, so that they preserve it.
+    members, member_codes = np.unique(members, return_inverse=True)
+    df['member'] = member_codes[df['member'].values]
+
+    # The observations of a member and id within the same dedup period always
+    # end up in the same time bin, where only the first one is kept, so the
+    # others are dropped beforehand, with a hash-based dedup on integer keys
+    dedup_period = _dedup_period(time_bins_size)
+    periods = df['timestamp'] if dedup_period is None else df['timestamp'] // dedup_period
+    df = df[~pd.concat([df['member'], df['observed_id'], periods], axis=1).duplicated()]
+
+    # Convert timestamp to datetime for convenience, and localize to UTC
+    df['datetime'] = _timestamps_to_datetimes(df.pop('timestamp').values, tz)
+
+    # Group per time bins, member and observed_id,
+    # and take the first value, arbitrarily
+    df = df.groupby([
+        _time_bins_grouper(df, time_bins_size),
+        'member',
+        'observed_id'
+    ], sort=False).first()
+
+    # Sort the data
+    df.sort_index(inplace=True)
+
+    # Put the member names back in the index
+    df.index = df.index.set_levels(members[df.index.levels[1]], level='member')
+
+    return df
+
 
 def member_to_badge_proximity(fileobject, time_bins_size='1min', tz='US/Eastern'):
     """Creates a member-to-badge proximity DataFrame from a proximity data file.
@@ -19,44 +124,99 @@ def member_to_badge_proximity(fileobject, time_bins_size='1min', tz='US/Eastern'
     Returns
     -------
     pd.DataFrame :
-        The member-to-badge proximity data.
+        The member-to-badge proximity data.  Its 'rssi' and 'count' columns are float32.
     """
-    
-    def readfile(fileobject):
-        for line in fileobject:
-            data = json.loads(line)['data']
-
-            for (observed_id, distance) in data['rssi_distances'].items():
-                yield (
-                    data['timestamp'],
-                    str(data['member']),
-                    int(observed_id),
-                    float(distance['rssi']),
-                    float(distance['count']),
-                )
-
-    df = pd.DataFrame(
-            readfile(fileobject),
-            columns=('timestamp', 'member', 'observed_id', 'rssi', 'count')
-    )
 
-    # Convert timestamp to datetime for convenience, and localize to UTC
-    df['datetime'] = pd.to_datetime(df['timestamp'], unit='s', utc=True) \
-            .dt.tz_localize('UTC').dt.tz_convert(tz)
-    del df['timestamp']
+    df, members = _read_member_to_badge_proximity(fileobject)
+    return _member_to_badge_proximity(df, members, time_bins_size, tz)
 
-    # Group per time bins, member and observed_id,
-    # and take the first value, arbitrarily
-    df = df.groupby([
-        pd.TimeGrouper(time_bins_size, key='datetime'),
-        'member',
-        'observed_id'
-    ]).first()
 
-    # Sort the data
-    df.sort_index(inplace=True)
+def member_to_badge_proximity_from_logs(logs, time_bins_size='1min', tz='US/Eastern', n_jobs=1,
+                                        cache_dir=None):
+    """Creates a member-to-badge proximity DataFrame from several proximity data files.
 
-    return df
+    The files can be read in parallel, and their observations are binned together, as if
+    the files had been concatenated.
+
+    Parameters
+    ----------
+    logs : list of str
+        Paths to the proximity data files.
+
+    time_bins_size : str
+        The size of the time bins used for resampling.  Defaults to '1min'.
+
+    tz : str
+        The time zone used for localization of dates.  Defaults to 'US/Eastern'.
+
+    n_jobs : int or None
+        The number of processes used to read the files.  Defaults to 1, i.e. the files
+        are read one after the other.  If None, uses all the CPUs.
+
+    cache_dir : str or None
+        A directory where the parsed files are cached, as numpy .npz files of their columns,
+        so that later calls do not parse them again, unless they changed.  Defaults to None,
+        i.e. no caching.
+
+    Returns
+    -------
+    pd.DataFrame :
+        The member-to-badge proximity data.  Its 'rssi' and 'count' columns are float32.
+    """
+
+    parts = _read_logs(logs, _read_member_to_badge_proximity, n_jobs=n_jobs, cache_dir=cache_dir)
+    if len(parts) == 0:
+        parts = [_read_member_to_badge_proximity([])]
+
+    # The member codes of each file are shifted past those of the previous files,
+    # so that they index the concatenated names
+    dfs, members = zip(*parts)
+    offset = 0
+    for df, file_members in zip(dfs, members):
+        df['member'] += offset
+        offset += len(file_members)
+
+    df = pd.concat(dfs, ignore_index=True)
+    return _member_to_badge_proximity(df, np.concatenate(members), time_bins_size, tz)
+
+
+def _is_run_start(*keys):
+    """Finds where each run of equal keys starts, in sorted key arrays.
+
+    Parameters
+    ----------
+    *keys : np.ndarray
+        Arrays of the same length, sorted together.
+
+    Returns
+    -------
+    np.ndarray :
+        A boolean array, True where the keys differ from the previous ones.
+    """
+    is_new = np.zeros(len(keys[0]), dtype=bool)
+    is_new[:1] = True
+    for values in keys:
+        is_new[1:] |= values[1:] != values[:-1]
+    return is_new
+
+
+def _drop_sorted_duplicates(df):
+    """Removes the rows whose index is the same as the previous row's.
+
+    The index must be sorted, so that the duplicates are contiguous: they are then found by comparing
+    each level with itself shifted by one, rather than by hashing the index tuples.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        A DataFrame with a sorted index.
+
+    Returns
+    -------
+    pd.DataFrame :
+        The first row of each index value.
+    """
+    return df[_is_run_start(*[df.index.get_level_values(level).values for level in range(df.index.nlevels)])]
 
 
 def member_to_member_proximity(m2badge, id2m):
@@ -74,18 +234,21 @@ def member_to_member_proximity(m2badge, id2m):
     Returns
     -------
     pd.DataFrame :
-        The member-to-member proximity data.
+        The member-to-member proximity data.  'rssi_max' has the dtype of the rssi of `m2badge`, and the
+        other columns are float64.
     """
 
-    df = m2badge.copy().reset_index()
+    # reset_index returns a new frame, so m2badge does not need to be copied first
+    df = m2badge.reset_index()
     
     # Join the member names using their badge ids
     # If id2m index is a MultiIndex, assume it is a time series and use legacy method
     if type(id2m.index) == pd.MultiIndex:
         df = df.join(id2m, on=['datetime', 'observed_id'], lsuffix='1', rsuffix='2')
-    # Otherwise, assume it is not time-based, and join without datetime
+    # Otherwise, assume it is not time-based, and simply map the ids to members
     else:
-        df = df.join(id2m, on=['observed_id'], lsuffix='1', rsuffix='2')
+        df.rename(columns={'member': 'member1'}, inplace=True)
+        df['member2'] = df['observed_id'].map(id2m)
     
     # Filter out the beacons (i.e. those ids that did not have a mapping)
     df.dropna(axis=0, subset=['member2'], inplace=True)
@@ -95,38 +258,68 @@ def member_to_member_proximity(m2badge, id2m):
     # missing values
     df['member2'] = df['member2'].astype(id2m.dtype)
         
-    # Set the index and sort it
-    df.set_index(['datetime', 'member1', 'member2'], inplace=True)
-    df.sort_index(inplace=True)
-
-    # Remove duplicate indexes, keeping the first (arbitrarily)
-    df = df[~df.index.duplicated(keep='first')]
-
     # If the dataframe is empty after the join, we can (and should) stop
     # here
     if len(df) == 0:
-        return df
-
-    # Reorder the index such that 'member1' is always lexicographically smaller than 'member2'
-    df.index = df.index.map(lambda ix: (ix[0], min(ix[1], ix[2]), max(ix[1], ix[2])))
-    df.index.names = ['datetime', 'member1', 'member2']
+        return df.set_index(['datetime', 'member1', 'member2'])
+
+    # The datetimes and the members (both members together) are replaced by sorted integer
+    # codes, once, and these codes are used for all the sorting and grouping below
+    datetimes = pd.DatetimeIndex(df['datetime'])
+    datetime_codes = datetimes.asi8
+    member_codes, members = pd.factorize(np.concatenate([
+        df['member1'].values,
+        df['member2'].values
+    ]), sort=True)
+    member1_codes = member_codes[:len(df)]
+    member2_codes = member_codes[len(df):]
+
+    # Sort (stably) by datetime, member1 and member2, and remove the duplicates,
+    # keeping the first (arbitrarily)
+    order = np.lexsort((member2_codes, member1_codes, datetime_codes))
+    order = order[_is_run_start(datetime_codes[order], member1_codes[order], member2_codes[order])]
+
+    # Reorder the members such that 'member1' is always lexicographically smaller than 'member2'
+    datetime_codes = datetime_codes[order]
+    member1_codes, member2_codes = np.minimum(member1_codes[order], member2_codes[order]), \
+        np.maximum(member1_codes[order], member2_codes[order])
+
+    # Sort again (stably), so that the records of each (datetime, member1, member2)
+    # triple are contiguous, and find where each triple starts
+    pair_order = np.lexsort((member2_codes, member1_codes, datetime_codes))
+    order = order[pair_order]
+    datetime_codes = datetime_codes[pair_order]
+    member1_codes = member1_codes[pair_order]
+    member2_codes = member2_codes[pair_order]
+    is_new = _is_run_start(datetime_codes, member1_codes, member2_codes)
+    starts = np.flatnonzero(is_new)
+    codes = np.cumsum(is_new) - 1
+    index = pd.MultiIndex.from_arrays([
+        datetimes[order[starts]],
+        members.take(member1_codes[starts]),
+        members.take(member2_codes[starts])
+    ], names=['datetime', 'member1', 'member2'])
 
     # For cases where we had proximity data coming from both sides,
     # we calculate two types of rssi:
     # * weighted_mean - take the average RSSI weighted by the counts, and the sum of the counts
     # * max - take the max value
-    df['rssi_weighted'] = df['count'] * df['rssi']
-    agg_f = collections.OrderedDict([('rssi', ['max']), ('rssi_weighted', ['sum']), ('count', ['sum'])])
-
-    df = df.groupby(level=df.index.names).agg(agg_f)
-    df['rssi_weighted'] /= df['count']
+    rssi = df['rssi'].values[order]
+    count = df['count'].values[order]
+    count_sum = np.bincount(codes, weights=count)
+    # The products are computed in double precision, like the sums
+    weighted_rssi = np.multiply(count, rssi, dtype=np.float64)
+    rssi_weighted_mean = np.bincount(codes, weights=weighted_rssi) / count_sum
+    rssi_max = np.maximum.reduceat(rssi, starts)
+
+    df = pd.DataFrame(collections.OrderedDict([
+        ('rssi', rssi_weighted_mean),  # for backward compatibility
+        ('rssi_max', rssi_max),
+        ('rssi_weighted_mean', rssi_weighted_mean),
+        ('count_sum', count_sum),
+    ]), index=index)
 
-    # rename columns
-    df.columns = ['rssi_max', 'rssi_weighted_mean', 'count_sum']
-    df['rssi'] = df['rssi_weighted_mean']  # for backward compatibility
-
-    # Select only the fields 'rssi' and 'count'
-    return df[['rssi', 'rssi_max', 'rssi_weighted_mean', 'count_sum']]
+    return df
 
 
 def _member_to_beacon_proximity(m2badge, beacons):
@@ -146,13 +339,12 @@ def _member_to_beacon_proximity(m2badge, beacons):
         The member-to-member proximity data.
     """
     
-    df = m2badge.copy()
-    
     # Rename 'observed_id' to 'beacon'
-    df = df.rename_axis(['datetime', 'member', 'beacon'])
+    df = m2badge.rename_axis(['datetime', 'member', 'beacon'])
     
-    # Filter out ids that are not in `beacons`
-    return df.loc[pd.IndexSlice[:, :, beacons],:]
+    # Filter out ids that are not in `beacons`, with a hash-based mask rather
+    # than a label lookup of each beacon in the index
+    return df[df.index.get_level_values('beacon').isin(beacons)]
 
 
 def member_to_beacon_proximity(m2badge, id2b):
@@ -172,27 +364,74 @@ def member_to_beacon_proximity(m2badge, id2b):
         The member-to-member proximity data.
     """
     
-    df = m2badge.copy().reset_index()
-
-    # Join the beacon names using their badge ids
-    df = df.join(id2b, on='observed_id') 
+    # Map the badge ids to beacon names directly from the index, rather than
+    # moving the whole frame into columns to join it
+    beacons = pd.Series(m2badge.index.get_level_values('observed_id')).map(id2b)
 
     # Filter out the members (i.e. those ids that did not have a mapping)
-    df.dropna(axis=0, subset=['beacon'], inplace=True)
+    is_beacon = beacons.notnull().values
 
     # Reset the beacons type to their original type
     # This is done because pandas likes to convert ints to floats when there are
     # missing values
-    df['beacon'] = df['beacon'].astype(id2b.dtype)
+    beacons = beacons[is_beacon].astype(id2b.dtype).values
+
+    df = m2badge.loc[is_beacon, ['rssi']]
+    df.index = pd.MultiIndex.from_arrays([
+        m2badge.index.get_level_values('datetime')[is_beacon],
+        m2badge.index.get_level_values('member')[is_beacon],
+        beacons
+    ], names=['datetime', 'member', 'beacon'])
 
-    # Set the index and sort it
-    df.set_index(['datetime', 'member', 'beacon'], inplace=True)
+    # Sort the index
     df.sort_index(inplace=True)
 
     # Remove duplicate indexes, keeping the first (arbitrarily)
-    df = df[~df.index.duplicated(keep='first')]
+    return _drop_sorted_duplicates(df)
+
+
+def _rolling_by_run(values, datetimes, is_new, window_size, min_periods):
+    """Creates a time-based rolling window over runs of values, which never spans two runs.
+
+    The windows of all the runs are computed in a single rolling pass over the values, rather than
+    one per run: the datetimes are replaced by a clock that only differs from them by the gaps
+    longer than the window, which are shortened to just over it, and that leaves such a gap at the
+    start of each run.  This changes no window, but keeps the runs out of each other's windows.
+
+    Parameters
+    ----------
+    values : np.ndarray
+        The values, sorted by run and datetime.
+
+    datetimes : pd.DatetimeIndex
+        The datetime of each value.
+
+    is_new : np.ndarray of bool
+        Whether each value starts a new run.
+
+    window_size : str
+        The size of the window.
+
+    min_periods : int
+        The minimum number of values in a window.
+
+    Returns
+    -------
+    pd.core.window.Rolling :
+        The rolling window, whose statistics are in the order of `values`.
+    """
+    window = pd.tseries.frequencies.to_offset(window_size).nanos
+    steps = np.minimum(np.diff(datetimes.values.astype('datetime64[ns]').astype(np.int64)), window + 1)
+    steps[is_new[1:]] = window + 1
+
+    # Fall back on one rolling pass per run if the clock would overflow
+    if steps.sum(dtype=np.float64) >= 2 ** 62:
+        return pd.Series(values, index=datetimes).groupby(np.cumsum(is_new), sort=False) \
+            .rolling(window=window_size, min_periods=min_periods)
 
-    return df[['rssi']]
+    clock = np.zeros(len(values), dtype=np.int64)
+    clock[1:] = np.cumsum(steps)
+    return pd.Series(values, index=pd.to_datetime(clock)).rolling(window=window_size, min_periods=min_periods)
 
 
 def member_to_beacon_proximity_smooth(m2b, window_size = '5min',
@@ -213,31 +452,37 @@ def member_to_beacon_proximity_smooth(m2b, window_size = '5min',
     pd.DataFrame :
         The member-to-beacon proximity data, after smoothing.
     """
-    df = m2b.copy().reset_index()
-    df = df.sort_values(by=['member', 'beacon', 'datetime'])
-    df.set_index('datetime', inplace=True)
-
-    df2 = df.groupby(['member', 'beacon'])[['rssi']] \
-        .rolling(window=window_size, min_periods=min_samples) \
-        .median()
-
-    # For std, we put-1 when std was NaN. This handles the case
-    # when there was only one record. If there were no records (
-    # median was not calculated because of min_samples), the record
-    # will be dropped because of the NaN in 'rssi'
-    df2['rssi_std']\
-        = df.groupby(['member', 'beacon'])[['rssi']] \
-        .rolling(window=window_size, min_periods=min_samples) \
-        .std().fillna(-1)
-
-    # number of records used for calculating the median
-    df2['rssi_smooth_window_count']\
-        = df.groupby(['member', 'beacon'])[['rssi']] \
-        .rolling(window=window_size, min_periods=min_samples) \
-        .count()
-
-    df2 = df2.reorder_levels(['datetime', 'member', 'beacon'], axis=0)\
-        .dropna().sort_index()
+    df = m2b.reset_index()
+
+    # Sort by member, beacon and datetime, on sorted integer codes rather than on the names
+    member_codes = pd.factorize(df['member'], sort=True)[0]
+    beacon_codes = pd.factorize(df['beacon'], sort=True)[0]
+    order = np.lexsort((pd.DatetimeIndex(df['datetime']).asi8, beacon_codes, member_codes))
+    df = df.take(order)
+
+    # The records of each (member, beacon) pair are contiguous once sorted, so
+    # the start of each pair is found by comparing consecutive records
+    is_new = _is_run_start(member_codes[order], beacon_codes[order])
+
+    # The three statistics are computed over the same windows, in a single call
+    stats = _rolling_by_run(df['rssi'].values, pd.DatetimeIndex(df['datetime']), is_new,
+                            window_size, min_samples).agg(['median', 'std', 'count'])
+
+    # The statistics come out in the order of the sorted records
+    df2 = pd.DataFrame(collections.OrderedDict([
+        ('rssi', stats['median'].values),
+
+        # For std, we put-1 when std was NaN. This handles the case
+        # when there was only one record. If there were no records (
+        # median was not calculated because of min_samples), the record
+        # will be dropped because of the NaN in 'rssi'
+        ('rssi_std', stats['std'].fillna(-1).values),
+
+        # number of records used for calculating the median
+        ('rssi_smooth_window_count', stats['count'].values),
+    ]), index=pd.MultiIndex.from_arrays([df['datetime'], df['member'], df['beacon']]))
+
+    df2 = df2.dropna().sort_index()
     return df2
 
 
@@ -260,17 +505,65 @@ def member_to_beacon_proximity_fill_gaps(m2b, time_bins_size='1min',
         The member-to-beacon proximity data, after filling gaps.
     """
 
-    df = m2b.copy().reset_index()
-    df = df.sort_values(by=['member', 'beacon', 'datetime'])
-    df.set_index('datetime', inplace=True)
+    columns = ['rssi', 'rssi_std', 'rssi_smooth_window_count']
+    df = m2b.reset_index()
+    datetimes = pd.DatetimeIndex(df['datetime'])
+    bin_starts = _time_bin_starts(datetimes, time_bins_size)
 
-    df = df.groupby(['member', 'beacon']) \
-        [['rssi', 'rssi_std','rssi_smooth_window_count']] \
-        .resample(time_bins_size) \
-        .fillna(method='ffill', limit=max_gap_size)
+    # Bins that do not divide an hour are left to pandas' resampling, one pair at a time
+    if bin_starts is None:
+        df = df.sort_values(by=['member', 'beacon', 'datetime'])
+        df.set_index('datetime', inplace=True)
+
+        df = df.groupby(['member', 'beacon'], sort=False) \
+            [columns] \
+            .resample(time_bins_size) \
+            .fillna(method='ffill', limit=max_gap_size)
+
+        df = df.reorder_levels(['datetime', 'member', 'beacon'], axis=0)\
+            .dropna().sort_index()
+        return df
 
-    df = df.reorder_levels(['datetime', 'member', 'beacon'], axis=0)\
-        .dropna().sort_index()
+    # Sort by member, beacon and datetime, on sorted integer codes rather than on the names
+    bin_size = pd.tseries.frequencies.to_offset(time_bins_size).nanos
+    nanos = datetimes.values.astype('datetime64[ns]').astype(np.int64)
+    member_codes = pd.factorize(df['member'], sort=True)[0]
+    beacon_codes = pd.factorize(df['beacon'], sort=True)[0]
+    order = np.lexsort((nanos, beacon_codes, member_codes))
+    nanos = nanos[order]
+    bin_starts = bin_starts[order]
+    is_last = np.ones(len(df), dtype=bool)
+    is_last[:-1] = _is_run_start(member_codes[order], beacon_codes[order])[1:]
+    next_nanos = np.append(nanos[1:], 0)
+
+    # As in the forward filling of a resampling, each record fills the bin it starts (if it starts
+    # one), and up to max_gap_size of the following bins that start before the next record of its
+    # pair; the last record of a pair has no following bins
+    starts_bin = nanos == bin_starts
+    starts_bin[:-1] &= is_last[:-1] | (next_nanos[:-1] != nanos[:-1])
+    n_following = np.zeros(len(df), dtype=np.int64)
+    n_following[~is_last] = -((bin_starts - next_nanos)[~is_last] // bin_size) - 1
+    np.maximum(n_following, 0, out=n_following)
+    if max_gap_size is not None:
+        np.minimum(n_following, max_gap_size, out=n_following)
+
+    # Each record is repeated once per bin it fills, and the bins are numbered from its own
+    counts = starts_bin + n_following
+    records = np.repeat(np.arange(len(df)), counts)
+    steps = np.arange(len(records)) - np.repeat(np.cumsum(counts) - counts, counts) + ~starts_bin[records]
+    filled_datetimes = pd.DatetimeIndex(pd.to_datetime(bin_starts[records] + steps * bin_size))
+    if datetimes.tz is not None:
+        filled_datetimes = filled_datetimes.tz_localize('UTC').tz_convert(datetimes.tz)
+
+    rows = order[records]
+    df = df[columns].take(rows)
+    df.index = pd.MultiIndex.from_arrays([
+        filled_datetimes,
+        m2b.index.get_level_values('member').take(rows),
+        m2b.index.get_level_values('beacon').take(rows)
+    ], names=['datetime', 'member', 'beacon'])
+
+    df = df.dropna().sort_index()
     return df
 
 
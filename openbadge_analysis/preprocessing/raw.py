@@ -1,6 +1,7 @@
-import json
 import os
+import json
 import datetime
+from ..core import json_loads
 
 
 def is_meeting_metadata(json_record):
@@ -42,7 +43,7 @@ def peek_line(f):
 def extract_log_version(fileobject):
     """Extracts the metadata from a fileobject, if present."""
     # Check if first line contains metadata
-    metadata = json.loads(peek_line(fileobject))
+    metadata = json_loads(peek_line(fileobject))
     
     if is_meeting_metadata(metadata):
         # If it does, extract the log version from there
@@ -86,7 +87,7 @@ def split_raw_data_by_day(fileobject, target, kind, log_version=None):
 
     # Read each line
     for line in fileobject:
-        data = json.loads(line)
+        data = json_loads(line)
 
         # Keep only relevant data
         if not data['type'] == kind + ' received':
@@ -100,8 +101,7 @@ def split_raw_data_by_day(fileobject, target, kind, log_version=None):
             days[day] = open(os.path.join(target, day), 'a')
 
         # Write the data to the corresponding day file
-        json.dump(data, days[day])
-        days[day].write('\n')
+        days[day].write(json.dumps(data) + '\n')
     
     # Free the memory
     for f in days.values():
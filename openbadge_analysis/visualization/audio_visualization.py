@@ -6,33 +6,16 @@ src_dir = os.path.join(os.getcwd(), os.pardir, '../src')
 sys.path.append(src_dir)
 from openbadge_analysis.preprocessing.audio import *
 
-def get_df_cor(df_meeting, sel_users):
-    """
-    return df of correlation of two selected users.
-    """
-    df_meeting_sel = df_meeting[sel_users]    
-    df_sel_sec = get_meet_sec(df_meeting_sel)
-    ts = []
-    cors = []
-    for i in df_sel_sec.index.unique():
-        frame = df_sel_sec.loc[i]
-        dfa, dfb = frame[sel_users[0]], frame[sel_users[1]]
-        p = stats.pearsonr(dfa, dfb)[0]
-        if not np.isnan(p):
-            ts.append(i)
-            cors.append(p)
-    df_cor = pd.DataFrame(np.vstack([ts, cors]).T, columns=['time', 'cor'])
-    df_cor.set_index('time', inplace=True)
-    return df_cor
-
 def para_window(df_meet, thre, figsize=(15,8)):
     xs, ys = [], []
+    ## the filtered frames all share the index of df_meet, so it is rounded to seconds only once
+    secs = get_meet_sec(df_meet).index
     for i in range(1, 30):
         window = i
-        df_flt = get_meet_flt(df_meet, window=window)
-        df_sec = get_meet_sec(df_flt)
-        df_cor = df_sec.groupby(df_sec.index).corr().dropna()
-        np_cor = np.triu(df_cor[df_cor >= thre].as_matrix(), 1)
+        df_sec = get_meet_flt(df_meet, window=window)
+        df_sec.index = secs
+        df_cor = get_cor_sec(df_sec).dropna()
+        np_cor = np.triu(df_cor[df_cor >= thre].values, 1)
         xs.append(window)
         ys.append(len(np_cor))
 
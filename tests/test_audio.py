@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_audio
+----------------------------------
+
+Tests for the `openbadge_analysis.preprocessing.audio` module.
+"""
+
+
+import sys
+import unittest
+import os
+
+import numpy as np
+import pandas as pd
+
+# add the 'src' directory as one where we can import modules
+src_dir = os.path.join(os.getcwd(), os.pardir)
+sys.path.append(src_dir)
+
+try:
+    # the audio module needs the plotting and sklearn requirements
+    from openbadge_analysis.preprocessing import audio
+except ImportError:
+    audio = None
+else:
+    from sklearn.neighbors import KernelDensity
+
+try:
+    import scipy.stats as stats
+except ImportError:
+    stats = None
+
+
+def _meeting(num_seconds=20, users=('A', 'B', 'C', 'D'), seed=0):
+    # 20 samples per second, with a few missing samples and a silent second
+    index = pd.date_range('2017-01-01 10:00:00', periods=20 * num_seconds, freq='50ms')
+    df_meet = pd.DataFrame(np.random.RandomState(seed).randint(0, 100, size=(len(index), len(users))).astype(float),
+                           index=index, columns=list(users))
+    df_meet.columns.name = 'member'
+    df_meet.iloc[45, 1] = np.nan
+    df_meet.iloc[101:103, 2] = np.nan
+    df_meet.iloc[140:160, 3] = 7.
+    return df_meet
+
+
+@unittest.skipIf(audio is None, "the audio module requirements are not installed")
+class TestGetMeetFlt(unittest.TestCase):
+
+    def setUp(self):
+        index = pd.date_range('2017-01-01', periods=40, freq='50ms')
+        self._df_meet = pd.DataFrame(np.random.RandomState(0).randint(0, 100, size=(40, 2)).astype(float),
+                                     index=index, columns=['A', 'B'])
+
+    def test_matches_pandas(self):
+        pd.testing.assert_frame_equal(audio.get_meet_flt(self._df_meet),
+                                      self._df_meet.rolling(window=8).median())
+
+    def test_frame_shorter_than_window(self):
+        # para_window sweeps the window from 1 to 29 samples
+        for window in range(1, 30):
+            pd.testing.assert_frame_equal(audio.get_meet_flt(self._df_meet.iloc[:5], window=window),
+                                          self._df_meet.iloc[:5].rolling(window=window).median())
+
+
+@unittest.skipIf(audio is None, "the audio module requirements are not installed")
+class TestCorrelations(unittest.TestCase):
+
+    def test_get_cor_sec(self):
+        df_meet_sec = audio.get_meet_sec(_meeting())
+        expected = df_meet_sec.groupby(df_meet_sec.index).corr()
+        pd.testing.assert_frame_equal(audio.get_cor_sec(df_meet_sec), expected, check_names=False)
+
+    def test_get_cor_sec_without_missing_samples(self):
+        df_meet_sec = audio.get_meet_sec(_meeting().fillna(0))
+        expected = df_meet_sec.groupby(df_meet_sec.index).corr()
+        pd.testing.assert_frame_equal(audio.get_cor_sec(df_meet_sec), expected, check_names=False)
+
+    @unittest.skipIf(stats is None, "scipy is not installed")
+    def test_get_df_cor(self):
+        # the correlations of each second, as computed before get_df_cor was vectorized
+        for df_meeting in [_meeting(), _meeting().fillna(0), _meeting().iloc[3:-5]]:
+            df_sec = audio.get_meet_sec(df_meeting[['B', 'C']])
+            ts, cors = [], []
+            for i in df_sec.index.unique():
+                frame = df_sec.loc[i]
+                p = stats.pearsonr(frame['B'], frame['C'])[0] if frame.notnull().all().all() else np.nan
+                if not np.isnan(p):
+                    ts.append(i)
+                    cors.append(p)
+            df_cor = audio.get_df_cor(df_meeting, ['B', 'C'])
+            self.assertEqual(list(df_cor.index), ts)
+            np.testing.assert_allclose(df_cor['cor'].values, cors)
+
+
+def _distributions(seed):
+    # silent and talking volumes of four users, as returned by get_ts_distribution
+    r = np.random.RandomState(seed)
+    return {user: [r.normal(r.uniform(20, 40), r.uniform(3, 8), r.randint(50, 500)),
+                   r.normal(r.uniform(45, 70), r.uniform(3, 10), r.randint(20, 300))]
+            for user in ['A', 'B', 'C', 'D']}
+
+
+def _sklearn_pdf(X, bandwidth=2, step=.1):
+    grid = np.arange(0, 100, step)[:, None]
+    return np.exp(KernelDensity(kernel='gaussian', bandwidth=bandwidth).fit(np.asarray(X)[:, None]).score_samples(grid))
+
+
+@unittest.skipIf(audio is None, "the audio module requirements are not installed")
+class TestFftKdePdfs(unittest.TestCase):
+
+    def test_matches_sklearn(self):
+        # the error of the binned estimate is at most (step / bandwidth) ** 2 / 8 of the peak density
+        for seed in range(10):
+            r = np.random.RandomState(seed)
+            Xs = [r.normal(30, 6, 300), r.normal(60, 10, 80), r.uniform(-10, 110, 50), np.array([42.])]
+            for bandwidth, step in [(2, .1), (1, .1), (5, .1), (2, .5), (1, .5)]:
+                pdfs = audio._fftkde_pdfs(Xs, bandwidth, step)
+                self.assertEqual(pdfs.shape, (len(Xs), len(np.arange(0, 100, step))))
+                for X, pdf in zip(Xs, pdfs):
+                    expected = _sklearn_pdf(X, bandwidth, step)
+                    np.testing.assert_allclose(pdf, expected, rtol=0,
+                                               atol=(float(step) / bandwidth) ** 2 / 8 * expected.max())
+
+
+@unittest.skipIf(audio is None, "the audio module requirements are not installed")
+class TestGetSeps(unittest.TestCase):
+
+    def _sklearn_seps(self, dt_nys, step=.1, prox=.01):
+        # get_seps as it was with sklearn kdes, whose bandwidth was always 2
+        seps = []
+        for user in dt_nys:
+            ns, ys = dt_nys[user]
+            pns, pys = _sklearn_pdf(ns, step=step), _sklearn_pdf(ys, step=step)
+            pys[pys <= prox] = 0
+            pns[pns <= prox] = 0
+            sep = -1
+            for i in np.arange(int(100 / step) - 1, 0, -1):
+                if pys[i - 1] < pns[i - 1] and pys[i] >= pns[i]:
+                    sep = i * step
+                    break
+            seps.append(sep)
+        seps = np.array(seps)
+        seps[seps == -1] = seps[seps != -1].mean()
+        return seps
+
+    def test_matches_sklearn(self):
+        # the FFT estimate of the pdfs can move a crossing by at most one step of the grid
+        for seed in range(20):
+            dt_nys = _distributions(seed)
+            expected = self._sklearn_seps(dt_nys)
+            np.testing.assert_allclose(audio.get_seps(dt_nys), expected, rtol=0, atol=.1 + 1e-9)
+            np.testing.assert_allclose(audio.get_seps(dt_nys, bandwidth=5), expected, rtol=0, atol=.1 + 1e-9)
+
+    def test_empty_distribution(self):
+        dt_nys = _distributions(0)
+        dt_nys['B'][1] = np.array([])
+        seps = audio.get_seps(dt_nys)
+        self.assertAlmostEqual(seps[1], np.mean(seps[[0, 2, 3]]))
+
+
+class _FakeGridSearchCV(object):
+    # stands in for sklearn's GridSearchCV, whose import is commented out in the audio module
+
+    def __init__(self, estimator, param_grid, cv=None):
+        self.best_params_ = {'bandwidth': param_grid['bandwidth'][0]}
+
+    def fit(self, X):
+        return self
+
+
+@unittest.skipIf(audio is None, "the audio module requirements are not installed")
+class TestGetKdePdf(unittest.TestCase):
+
+    def setUp(self):
+        self._X = np.random.RandomState(0).uniform(20, 80, size=50)
+
+    def test_default_grid(self):
+        kde, pdf, samples = audio.get_kde_pdf(self._X, step=.5, num_samples=10)
+        self.assertEqual(pdf.shape, (len(audio._get_grid(.5)),))
+        self.assertEqual(len(samples), 10)
+
+    def test_optimize(self):
+        audio.GridSearchCV = _FakeGridSearchCV
+        audio.LeaveOneOut = lambda n: None
+        try:
+            kde, pdf, samples = audio.get_kde_pdf(self._X, step=.5, optimize=True, with_samples=False)
+        finally:
+            del audio.GridSearchCV, audio.LeaveOneOut
+        self.assertAlmostEqual(kde.bandwidth, .1)
+        self.assertEqual(pdf.shape, (len(audio._get_grid(.5)),))
+        self.assertIsNone(samples)
+
+if __name__ == '__main__':
+    sys.exit(unittest.main())
@@ -0,0 +1,306 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_core
+----------------------------------
+
+Tests for the `openbadge_analysis.core` helpers.
+"""
+
+
+import sys
+import unittest
+import os
+import shutil
+import tempfile
+import json
+
+import numpy as np
+import pandas as pd
+
+# add the 'src' directory as one where we can import modules
+src_dir = os.path.join(os.getcwd(), os.pardir)
+sys.path.append(src_dir)
+
+from openbadge_analysis import core
+from openbadge_analysis.core import _rolling_median, is_speaking, fill_boolean_segments, make_stitched, \
+    load_member_badges_from_logs, load_audio_chunks_as_json_objects, load_proximity_chunks_as_json_objects, \
+    _read_log, _log_cache_path
+
+
+class TestRollingMedian(unittest.TestCase):
+
+    def setUp(self):
+        self._df = pd.DataFrame(np.random.RandomState(0).rand(50, 3), columns=['a', 'b', 'c'])
+
+    def test_matches_pandas(self):
+        for window, min_periods in [(1, None), (8, None), (8, 1), (50, 3)]:
+            expected = self._df.rolling(window=window, min_periods=min_periods or window).median()
+            pd.testing.assert_frame_equal(_rolling_median(self._df, window, min_periods), expected)
+
+    def test_frame_shorter_than_window(self):
+        df = self._df.iloc[:5]
+        pd.testing.assert_frame_equal(_rolling_median(df, window=8),
+                                      df.rolling(window=8).median())
+        pd.testing.assert_frame_equal(_rolling_median(df, window=8, min_periods=1),
+                                      df.rolling(window=8, min_periods=1).median())
+
+
+class TestIsSpeaking(unittest.TestCase):
+
+    def test_recording_shorter_than_median_window(self):
+        # The median window is two minutes, i.e. 2400 samples at the default sample delay
+        index = pd.date_range('2017-01-01', periods=100, freq='50ms')
+        df_meeting = pd.DataFrame(np.random.RandomState(0).randint(0, 100, size=(100, 2)),
+                                  index=index, columns=['A', 'B'])
+        df_is_speech = is_speaking(df_meeting)
+        self.assertEqual(df_is_speech.shape, df_meeting.shape)
+        self.assertTrue((df_is_speech.dtypes == bool).all())
+
+
+def _fill_boolean_segments_loop(x_series, min_length, value):
+    # The sample loop that fill_boolean_segments used to run
+    total_samples = len(x_series)
+    not_value = not value
+    i = 0
+    length = 0
+    start = 0
+    while i < total_samples:
+        current_value = x_series[i]
+        if i == 0:
+            previous_value = current_value
+        if previous_value != current_value or i == total_samples - 1:
+            stop = i
+            if length < min_length and previous_value == value:
+                x_series[start:stop] = not_value
+            length = 1
+            start = i
+        else:
+            length += 1
+        i = i + 1
+        previous_value = current_value
+
+
+class TestFillBooleanSegments(unittest.TestCase):
+
+    def test_last_segment(self):
+        # The last segment is measured and filled without its last sample
+        x = np.array([0, 0, 1, 1, 1], dtype=bool)
+        fill_boolean_segments(x, 3, True)
+        np.testing.assert_array_equal(x, [0, 0, 0, 0, 1])
+        x = np.array([1, 1, 0, 1], dtype=bool)
+        fill_boolean_segments(x, 2, True)
+        np.testing.assert_array_equal(x, [1, 1, 0, 1])
+        x = np.array([1], dtype=bool)
+        fill_boolean_segments(x, 3, True)
+        np.testing.assert_array_equal(x, [1])
+
+    def test_matches_loop(self):
+        r = np.random.RandomState(0)
+        for n in [0, 1, 2, 3, 10, 200]:
+            for p in [.1, .5, .9]:
+                x = r.rand(n) < p
+                for min_length in [1, 2, 3, 10]:
+                    for value in [True, False]:
+                        expected = x.copy()
+                        _fill_boolean_segments_loop(expected, min_length, value)
+                        actual = x.copy()
+                        fill_boolean_segments(actual, min_length, value)
+                        np.testing.assert_array_equal(actual, expected)
+                        series = pd.Series(x.copy())
+                        fill_boolean_segments(series, min_length, value)
+                        np.testing.assert_array_equal(series.values, expected)
+
+    def test_make_stitched(self):
+        r = np.random.RandomState(1)
+        df_is_speech = pd.DataFrame(r.rand(500, 3) < .3, columns=['A', 'B', 'C'])
+        expected = df_is_speech.copy()
+        for member in expected.columns:
+            x = expected[member].values.copy()
+            _fill_boolean_segments_loop(x, 10, False)
+            _fill_boolean_segments_loop(x, 40, True)
+            expected[member] = x
+        pd.testing.assert_frame_equal(make_stitched(df_is_speech), expected)
+
+
+_reader_calls = []
+
+
+def _read_lines(f):
+    _reader_calls.append(f.name)
+    lines = f.read().splitlines()
+    return pd.DataFrame({'line': np.array(lines, dtype=object), 'length': np.array([len(line) for line in lines])},
+                        columns=['line', 'length'])
+
+
+class TestReadLogCache(unittest.TestCase):
+
+    def setUp(self):
+        self._dir = tempfile.mkdtemp()
+        self._log = os.path.join(self._dir, 'log.txt')
+        with open(self._log, 'w') as f:
+            f.write('a\nbb\nccc\n')
+        self._expected = pd.DataFrame({'line': np.array(['a', 'bb', 'ccc'], dtype=object),
+                                       'length': np.array([1, 2, 3])}, columns=['line', 'length'])
+        self._cache_dir = os.path.join(self._dir, 'cache')
+        os.makedirs(self._cache_dir)
+        del _reader_calls[:]
+
+    def tearDown(self):
+        shutil.rmtree(self._dir)
+
+    def test_cached(self):
+        pd.testing.assert_frame_equal(_read_log(self._log, _read_lines, cache_dir=self._cache_dir), self._expected)
+        pd.testing.assert_frame_equal(_read_log(self._log, _read_lines, cache_dir=self._cache_dir), self._expected)
+        self.assertEqual(len(_reader_calls), 1)
+        self.assertEqual(os.listdir(self._cache_dir),
+                         [os.path.basename(_log_cache_path(self._log, _read_lines, self._cache_dir, {}))])
+
+    def test_cache_format(self):
+        # The cache holds plain arrays, which are loaded without unpickling
+        _read_log(self._log, _read_lines, cache_dir=self._cache_dir)
+        path = _log_cache_path(self._log, _read_lines, self._cache_dir, {})
+        with np.load(path, allow_pickle=False) as data:
+            self.assertEqual(data['0.columns'].tolist(), ['line', 'length'])
+            self.assertEqual(data['0.0'].tolist(), ['a', 'bb', 'ccc'])
+
+    def test_tuple_of_frame_and_array(self):
+        result = (self._expected, np.array(['x', 'y'], dtype=object), np.arange(3, dtype=np.float32))
+        path = os.path.join(self._cache_dir, 'result.npz')
+        with open(path, 'wb') as f:
+            core._save_log_cache(f, result)
+        loaded = core._load_log_cache(path)
+        self.assertIsInstance(loaded, tuple)
+        pd.testing.assert_frame_equal(loaded[0], result[0])
+        self.assertEqual(loaded[1].dtype, object)
+        np.testing.assert_array_equal(loaded[1], result[1])
+        self.assertEqual(loaded[2].dtype, np.float32)
+        np.testing.assert_array_equal(loaded[2], result[2])
+
+    def test_modified_log(self):
+        _read_log(self._log, _read_lines, cache_dir=self._cache_dir)
+        with open(self._log, 'a') as f:
+            f.write('dddd\n')
+        df = _read_log(self._log, _read_lines, cache_dir=self._cache_dir)
+        self.assertEqual(list(df['line']), ['a', 'bb', 'ccc', 'dddd'])
+        self.assertEqual(len(_reader_calls), 2)
+        self.assertEqual(len(os.listdir(self._cache_dir)), 2)
+
+    def test_cache_version_in_key(self):
+        path = _log_cache_path(self._log, _read_lines, self._cache_dir, {})
+        version = core._LOG_CACHE_VERSION
+        core._LOG_CACHE_VERSION = version + 1
+        try:
+            self.assertNotEqual(_log_cache_path(self._log, _read_lines, self._cache_dir, {}), path)
+        finally:
+            core._LOG_CACHE_VERSION = version
+
+    def test_destination_cached_concurrently(self):
+        # Simulates rename on Windows, when another process cached the same log in the meantime
+        def rename(src, dst):
+            shutil.copy(src, dst)
+            raise OSError('destination exists')
+
+        os_rename = os.rename
+        os.rename = rename
+        try:
+            pd.testing.assert_frame_equal(_read_log(self._log, _read_lines, cache_dir=self._cache_dir),
+                                          self._expected)
+        finally:
+            os.rename = os_rename
+        self.assertEqual(len(os.listdir(self._cache_dir)), 1)
+        pd.testing.assert_frame_equal(_read_log(self._log, _read_lines, cache_dir=self._cache_dir), self._expected)
+        self.assertEqual(len(_reader_calls), 1)
+
+
+def _write_log(path, lines, log_version=None):
+    with open(path, 'w') as f:
+        if log_version is not None:
+            f.write(json.dumps({'type': 'meeting started', 'data': {'log_version': log_version}}) + '\n')
+        for line in lines:
+            f.write(json.dumps(line) + '\n')
+
+
+def _proximity_chunk(timestamp, member, badge_address):
+    return {'type': 'proximity received',
+            'data': {'timestamp': timestamp, 'member': member, 'badge_address': badge_address,
+                     'rssi_distances': {'1': {'rssi': -60, 'count': 1}}}}
+
+
+_data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+
+class TestLoadChunks(unittest.TestCase):
+
+    def test_audio_chunks_list(self):
+        for name, log_version, num_chunks in [('meeting_audio_file_v1.txt', '1.0', 261),
+                                              ('meeting_audio_file_v2.txt', '2.0', None)]:
+            with open(os.path.join(_data_dir, name), 'r') as f:
+                chunks = load_audio_chunks_as_json_objects(f, log_version=log_version)
+            # The chunks are still available once the file is closed
+            self.assertIsInstance(chunks, list)
+            if num_chunks is not None:
+                self.assertEqual(len(chunks), num_chunks)
+            self.assertTrue(len(chunks) > 0)
+            self.assertIn('samples', chunks[0])
+            self.assertIn('samples', chunks[-1])
+
+    def test_proximity_chunks_list(self):
+        dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(dir, 'proximity.txt')
+            _write_log(path, [_proximity_chunk(1500000000, 'a', '00:00:00:00:00:01'),
+                              {'type': 'audio received', 'data': {}},
+                              _proximity_chunk(1500000010, 'b', '00:00:00:00:00:02')], '2.0')
+            with open(path, 'r') as f:
+                chunks = load_proximity_chunks_as_json_objects(f)
+        finally:
+            shutil.rmtree(dir)
+        self.assertIsInstance(chunks, list)
+        self.assertEqual([chunk['member'] for chunk in chunks], ['a', 'b'])
+
+
+class TestLoadMemberBadgesFromLogs(unittest.TestCase):
+
+    def setUp(self):
+        self._dir = tempfile.mkdtemp()
+        self._chunks = [_proximity_chunk(1500000000, 'a', '00:00:00:00:00:01'),
+                        _proximity_chunk(1500000010, 'a', '00:00:00:00:00:01'),
+                        _proximity_chunk(1500000070, 'b', '00:00:00:00:00:02')]
+
+    def tearDown(self):
+        shutil.rmtree(self._dir)
+
+    def test_proximity_log_version(self):
+        v2 = os.path.join(self._dir, 'v2.txt')
+        _write_log(v2, self._chunks, '2.0')
+        df = load_member_badges_from_logs([v2], log_kind='proximity')
+        self.assertEqual(list(df['member']), ['a', 'b'])
+        self.assertEqual(list(df['badge_address']), ['00:00:00:00:00:01', '00:00:00:00:00:02'])
+
+        # The header takes precedence over log_version
+        v1 = os.path.join(self._dir, 'v1.txt')
+        _write_log(v1, self._chunks, '1.0')
+        with self.assertRaises(Exception) as context:
+            load_member_badges_from_logs([v1], log_kind='proximity', log_version='2.0')
+        self.assertIn('Version 1.0 does not support proximity data', str(context.exception))
+
+        headless = os.path.join(self._dir, 'headless.txt')
+        _write_log(headless, self._chunks)
+        with self.assertRaises(Exception) as context:
+            load_member_badges_from_logs([headless], log_kind='proximity')
+        self.assertIn('log version was not set', str(context.exception))
+        df = load_member_badges_from_logs([headless], log_kind='proximity', log_version='2.0')
+        self.assertEqual(list(df['member']), ['a', 'b'])
+
+    def test_n_jobs(self):
+        logs = []
+        for i in range(3):
+            logs.append(os.path.join(self._dir, 'log{}.txt'.format(i)))
+            _write_log(logs[-1], self._chunks[i:], '2.0')
+        expected = load_member_badges_from_logs(logs, log_kind='proximity')
+        pd.testing.assert_frame_equal(load_member_badges_from_logs(logs, log_kind='proximity', n_jobs=2), expected)
+
+if __name__ == '__main__':
+    sys.exit(unittest.main())
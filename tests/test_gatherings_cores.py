@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_gatherings_cores
+----------------------------------
+
+Tests for the `openbadge_analysis.analysis.gatherings_cores` module.
+"""
+
+
+import sys
+import unittest
+import os
+
+import numpy as np
+import pandas as pd
+
+# add the 'src' directory as one where we can import modules
+src_dir = os.path.join(os.getcwd(), os.pardir)
+sys.path.append(src_dir)
+
+from openbadge_analysis.analysis.gatherings_cores import extract_groups, gather_groups, extract_cores, \
+    _group_distance
+
+try:
+    import networkx as nx
+except ImportError:
+    nx = None
+
+
+def _extract_groups_networkx(m2m):
+    """The original networkx implementation of `extract_groups`, used as a reference"""
+    groups = m2m.groupby('datetime').apply(
+        lambda df:
+        pd.Series([frozenset(c) for c in nx.connected_components(nx.from_pandas_edgelist(df.reset_index(), 'member1', 'member2'))])
+    )
+    groups.name = 'members'
+
+    return groups.reset_index()[['datetime', 'members']]
+
+
+def _gather_groups_loop(groups, distance_threshold=.49, gamma=.08):
+    """The original implementation of `gather_groups`, merging the closest
+    gatherings one pair at a time, used as a reference"""
+    n = len(groups)
+    ga = groups.values
+
+    dist = np.zeros((n, n))
+    for i in range(n):
+        for j in range(i+1, n):
+            dist[i, j] = _group_distance(ga[i, :], ga[j, :], gamma=gamma)
+    dist += dist.T
+    np.fill_diagonal(dist, 1.0)
+
+    grp2gth = dict(zip(range(n), range(n)))
+    gth2grp = dict(zip(range(n), [[i] for i in range(n)]))
+
+    while len(gth2grp) > 1:
+        i, j = np.unravel_index(dist.argmin(), dist.shape)
+        if dist[i, j] > distance_threshold:
+            break
+
+        gth0 = min(grp2gth[i], grp2gth[j])
+        gth1 = max(grp2gth[i], grp2gth[j])
+        for g in gth2grp[gth1]:
+            grp2gth[g] = gth0
+        gth2grp[gth0].extend(gth2grp[gth1])
+        del gth2grp[gth1]
+
+        newdist = np.minimum(dist[i, :], dist[j, :])
+        for g in gth2grp[gth0]:
+            newdist[g] = 1.0
+        for g in gth2grp[gth0]:
+            dist[g, :] = newdist
+            dist[:, g] = newdist
+
+    return [groups.iloc[gs].copy().set_index('datetime').sort_index()['members']
+            for gs in sorted(gth2grp.values())]
+
+
+def _extract_core_pandas(gathering):
+    """The original pandas implementation of the core of a gathering, used as a
+    reference"""
+    df = pd.DataFrame([(t, m) for t, group in gathering.items() for m in group], columns=['datetime', 'member'])
+    df['participates'] = 1.
+    df = df.set_index(['datetime', 'member'])['participates'].unstack().fillna(0.0)
+
+    participations = (df.sum()/len(df.index)).sort_values(ascending=False)
+    gaps = participations - participations.shift(-1)
+    n = len(df.columns)
+    threshold = 1./(n + 1) + np.sqrt(1.*n/(n+1)**2/(n+2))
+
+    return list(participations.loc[:(gaps > threshold).idxmax()].index)
+
+
+def _m2m(seed, n_bins=40):
+    """Random member-to-member edges over minute time bins, between a few
+    overlapping teams, and occasional visitors"""
+    rng = np.random.RandomState(seed)
+    teams = [list('abcd'), list('defg'), list('ijk')]
+    visitors = list('xyz')
+    start = pd.Timestamp('2017-06-01 10:00', tz='US/Eastern')
+
+    rows = []
+    for t in range(n_bins):
+        datetime = start + pd.Timedelta(minutes=t)
+        for team in teams:
+            # teams meet during a part of the time only
+            if rng.rand() < .6:
+                present = [m for m in team if rng.rand() < .95]
+                if rng.rand() < .3:
+                    present.append(visitors[rng.randint(len(visitors))])
+                for m1, m2 in zip(present[:-1], present[1:]):
+                    rows.append((datetime, m1, m2))
+
+    return pd.DataFrame(rows, columns=['datetime', 'member1', 'member2']).set_index(['datetime', 'member1', 'member2'])
+
+
+def _sorted_groups(groups):
+    return sorted((g['datetime'], tuple(sorted(g['members']))) for _, g in groups.iterrows())
+
+
+class TestExtractGroups(unittest.TestCase):
+
+    @unittest.skipIf(nx is None, 'networkx is not installed')
+    def test_networkx(self):
+        for seed in range(5):
+            m2m = _m2m(seed)
+            self.assertEqual(_sorted_groups(extract_groups(m2m)),
+                             _sorted_groups(_extract_groups_networkx(m2m)))
+
+    def test_sorted(self):
+        groups = extract_groups(_m2m(0))
+        self.assertListEqual(list(groups.columns), ['datetime', 'members'])
+        self.assertTrue(groups['datetime'].is_monotonic_increasing)
+
+    def test_empty(self):
+        groups = extract_groups(_m2m(0).iloc[:0])
+        self.assertEqual(len(groups), 0)
+        self.assertListEqual(list(groups.columns), ['datetime', 'members'])
+
+
+class TestGatherGroups(unittest.TestCase):
+
+    def test_loop(self):
+        for seed in range(5):
+            groups = extract_groups(_m2m(seed))
+            for distance_threshold in (.3, .49, .7):
+                gatherings = gather_groups(groups, distance_threshold=distance_threshold)
+                expected = _gather_groups_loop(groups, distance_threshold=distance_threshold)
+
+                self.assertEqual(len(gatherings), len(expected))
+                # The groups of a gathering at the same time bin are not in a
+                # specific order
+                for gathering, expected_gathering in zip(gatherings, expected):
+                    self.assertEqual(_sorted_groups(gathering.reset_index()),
+                                     _sorted_groups(expected_gathering.reset_index()))
+
+    def test_single_group(self):
+        groups = extract_groups(_m2m(0)).iloc[:1]
+        gatherings = gather_groups(groups)
+
+        self.assertEqual(len(gatherings), 1)
+        self.assertEqual(list(gatherings[0]), list(groups['members']))
+
+    def test_empty(self):
+        groups = extract_groups(_m2m(0).iloc[:0])
+        self.assertEqual(gather_groups(groups), [])
+        self.assertEqual(len(extract_cores([])), 0)
+
+
+class TestExtractCores(unittest.TestCase):
+
+    def test_pandas(self):
+        for seed in range(5):
+            gatherings = gather_groups(extract_groups(_m2m(seed)))
+            cores = extract_cores(gatherings)
+
+            expected = [(g.index.min(), g.index.max(), frozenset(_extract_core_pandas(g)))
+                        for g in gatherings if len(g) > 2]
+            expected = [core for core in expected if len(core[2]) > 1]
+
+            self.assertGreater(len(expected), 0)
+            self.assertEqual(list(cores.itertuples(index=False, name=None)), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_hublog
+----------------------------------
+
+Tests for the `openbadge_analysis.preprocessing.hublog` module.
+"""
+
+
+import sys
+import unittest
+import os
+import re
+import ast
+
+# add the 'src' directory as one where we can import modules
+src_dir = os.path.join(os.getcwd(), os.pardir)
+sys.path.append(src_dir)
+
+from openbadge_analysis.preprocessing.hublog import _hublog_read_scan_line
+
+
+def _hublog_read_scan_line_original(line):
+    """The original scan line parser, used as a reference"""
+    ansi_escape = re.compile(r'\x1B\[[0-?]*[ -/]*[@-~]')
+    line = ansi_escape.sub('', line)
+    line = line.rstrip("\n\r")
+
+    if re.match("^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d+ - \w+ - .*$", line) is None:
+        return None
+
+    data = line.split(" - ")[2]
+    if not data.startswith("Found"):
+        return None
+
+    scan_data = {}
+    adv_payload_raw = data.split("adv_payload': ")[1][0:-1]
+    adv_payload = ast.literal_eval(adv_payload_raw)
+    if not adv_payload:
+        adv_payload = {'proximity_status': None, 'sync_status': None, 'audio_status': None, 'mac': None,
+                       'badge_id': None, 'voltage': None, 'status_flags': None, 'project_id': None}
+
+    scan_data.update(adv_payload)
+    scan_data['mac'] = data.split(" ")[1][0:-1]
+    scan_data['rssi'] = data.split(": ")[2].split(",")[0]
+    scan_data['datetime'] = line.split(" - ")[0]
+    scan_data['adv_payload'] = re.sub('[ :\'\[]', '', adv_payload_raw)
+    return scan_data
+
+
+_PAYLOAD = "{'voltage': 2.95, 'badge_id': 12, 'project_id': 3, 'sync_status': 1, 'audio_status': 0, " \
+           "'proximity_status': 1, 'mac': 'e4:5a', 'status_flags': [1, 2]}"
+
+_SCAN_LINES = [
+    "2017-06-01 10:00:00,123 - INFO - Found e4:5a:2b:3c:4d:5e, data: {'rssi': -63, 'adv_payload': "
+    + _PAYLOAD + "}\n",
+    "2017-06-01 10:00:01,5 - INFO - Found e4:5a:2b:3c:4d:5f, data: {'rssi': -80, 'adv_payload': None}\n",
+    "2017-06-01 10:00:02,000 - DEBUG - Found e4:5a:2b:3c:4d:60, data: {'rssi': -70, 'device': 'hci0', "
+    "'adv_payload': " + _PAYLOAD + "}\r\n",
+    "\x1b[32m2017-06-01 10:00:03,999 - INFO - Found e4:5a:2b:3c:4d:61, data: {'rssi': -90, "
+    "'adv_payload': {}}\x1b[0m\n",
+]
+
+_OTHER_LINES = [
+    "2017-06-01 10:00:04,000 - INFO - [e4:5a:2b:3c:4d:5e] Badge previously unsynced.\n",
+    "garbage line\n",
+    "2017-06-01 10:00:06 - INFO - Found e4:5a:2b:3c:4d:5e, data: {'rssi': -63, 'adv_payload': None}\n",
+    "\n",
+]
+
+_MALFORMED_SCAN_LINES = [
+    # truncated line, no payload
+    "2017-06-01 10:00:07,000 - INFO - Found e4:5a:2b:3c:4d:5e, data: {'rssi': -63\n",
+    # starts like a scan line
+    "2017-06-01 10:00:05,000 - INFO - Founder of something\n",
+    # truncated payload
+    "2017-06-01 10:00:08,000 - INFO - Found e4:5a:2b:3c:4d:5e, data: {'rssi': -63, 'adv_payload': {'volt}\n",
+]
+
+
+class TestHublogReadScanLine(unittest.TestCase):
+
+    def test_scan_lines(self):
+        for line in _SCAN_LINES:
+            self.assertEqual(_hublog_read_scan_line(line), _hublog_read_scan_line_original(line))
+            self.assertIsNotNone(_hublog_read_scan_line(line))
+
+    def test_other_lines(self):
+        for line in _OTHER_LINES:
+            self.assertIsNone(_hublog_read_scan_line(line))
+            self.assertIsNone(_hublog_read_scan_line_original(line))
+
+    def test_malformed_scan_lines(self):
+        for line in _MALFORMED_SCAN_LINES:
+            with self.assertRaises(Exception) as context:
+                _hublog_read_scan_line_original(line)
+
+            self.assertRaises(type(context.exception), _hublog_read_scan_line, line)
+
+    def test_fields(self):
+        scan = _hublog_read_scan_line(_SCAN_LINES[0])
+        self.assertEqual(scan['mac'], 'e4:5a:2b:3c:4d:5e')
+        self.assertEqual(scan['rssi'], '-63')
+        self.assertEqual(scan['datetime'], '2017-06-01 10:00:00,123')
+        self.assertEqual(scan['badge_id'], 12)
+
+
+if __name__ == '__main__':
+    unittest.main()
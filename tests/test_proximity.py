@@ -0,0 +1,249 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_proximity
+----------------------------------
+
+Tests for the `openbadge_analysis.preprocessing.proximity` module.
+"""
+
+
+import sys
+import unittest
+import os
+import json
+import shutil
+import tempfile
+import collections
+
+import numpy as np
+import pandas as pd
+
+# add the 'src' directory as one where we can import modules
+src_dir = os.path.join(os.getcwd(), os.pardir)
+sys.path.append(src_dir)
+
+from openbadge_analysis.preprocessing.proximity import _read_member_to_badge_proximity, \
+    member_to_badge_proximity_from_logs, member_to_member_proximity, member_to_beacon_proximity_fill_gaps, \
+    _rolling_by_run
+
+
+def _proximity_line(timestamp, member, rssi_distances):
+    return json.dumps({'type': 'proximity received',
+                       'data': {'timestamp': timestamp, 'member': member, 'badge_address': 'x',
+                                'rssi_distances': rssi_distances}})
+
+
+def _member_to_member_proximity_groupby(m2badge, id2m):
+    """The original groupby implementation of `member_to_member_proximity`, used as a reference"""
+    df = m2badge.copy().reset_index()
+    if type(id2m.index) == pd.MultiIndex:
+        df = df.join(id2m, on=['datetime', 'observed_id'], lsuffix='1', rsuffix='2')
+    else:
+        df = df.join(id2m, on=['observed_id'], lsuffix='1', rsuffix='2')
+    df.dropna(axis=0, subset=['member2'], inplace=True)
+    df['member2'] = df['member2'].astype(id2m.dtype)
+    df.set_index(['datetime', 'member1', 'member2'], inplace=True)
+    df.sort_index(inplace=True)
+    df = df[~df.index.duplicated(keep='first')]
+
+    df.index = df.index.map(lambda ix: (ix[0], min(ix[1], ix[2]), max(ix[1], ix[2])))
+    df.index.names = ['datetime', 'member1', 'member2']
+
+    df['rssi_weighted'] = df['count'] * df['rssi']
+    agg_f = collections.OrderedDict([('rssi', ['max']), ('rssi_weighted', ['sum']), ('count', ['sum'])])
+    df = df.groupby(level=df.index.names).agg(agg_f)
+    df['rssi_weighted'] /= df['count']
+    df.columns = ['rssi_max', 'rssi_weighted_mean', 'count_sum']
+    df['rssi'] = df['rssi_weighted_mean']
+
+    return df[['rssi', 'rssi_max', 'rssi_weighted_mean', 'count_sum']]
+
+
+def _member_to_beacon_proximity_fill_gaps_resample(m2b, time_bins_size, max_gap_size):
+    """The original resampling implementation of `member_to_beacon_proximity_fill_gaps`, used as a
+    reference"""
+    df = m2b.copy().reset_index()
+    df = df.sort_values(by=['member', 'beacon', 'datetime'])
+    df.set_index('datetime', inplace=True)
+
+    df = df.groupby(['member', 'beacon']) \
+        [['rssi', 'rssi_std', 'rssi_smooth_window_count']] \
+        .resample(time_bins_size) \
+        .ffill(limit=max_gap_size)
+
+    return df.reorder_levels(['datetime', 'member', 'beacon'], axis=0).dropna().sort_index()
+
+
+def _m2badge(seed, n=2000):
+    """Random member-to-badge proximity data, over 30 minutes, where the badges 0 to 7 are worn by
+    members, and the others are beacons"""
+    rng = np.random.RandomState(seed)
+    start = pd.Timestamp('2017-01-01', tz='US/Eastern')
+    df = pd.DataFrame({
+        'datetime': start + pd.to_timedelta(rng.randint(0, 30, n), unit='m'),
+        'member': ['m{}'.format(k) for k in rng.randint(0, 8, n)],
+        'observed_id': rng.randint(0, 12, n),
+        'rssi': rng.randint(-90, -40, n).astype(np.float32),
+        'count': rng.randint(1, 5, n).astype(np.float32),
+    })
+    return df.set_index(['datetime', 'member', 'observed_id']).sort_index()
+
+
+def _m2b(seed, n, bin_seconds, aligned, tz):
+    """Random smoothed member-to-beacon proximity data, over three hours including the DST change of
+    US/Eastern, with datetimes on the bins or anywhere"""
+    rng = np.random.RandomState(seed)
+    seconds = rng.randint(0, 3 * 3600, n)
+    if aligned:
+        seconds = seconds // bin_seconds * bin_seconds
+    df = pd.DataFrame({
+        'datetime': pd.Timestamp('2017-03-12 00:00', tz=tz) + pd.to_timedelta(seconds, unit='s'),
+        'member': ['m{}'.format(k) for k in rng.randint(0, 4, n)],
+        'beacon': rng.randint(0, 3, n),
+        'rssi': rng.normal(-60, 5, n),
+        'rssi_std': rng.rand(n),
+        'rssi_smooth_window_count': rng.randint(1, 5, n).astype(np.float64),
+    })
+    df = df.drop_duplicates(['datetime', 'member', 'beacon'])
+    return df.set_index(['datetime', 'member', 'beacon']).sort_index()
+
+
+class TestReadMemberToBadgeProximity(unittest.TestCase):
+
+    def test_integral_rssi(self):
+        lines = [_proximity_line(1500000000, 'a', {'1': {'rssi': -60, 'count': 2}, '2': {'rssi': -75, 'count': 1}}),
+                 _proximity_line(1500000010, 'b', {'1': {'rssi': -128, 'count': 3}})]
+        df, members = _read_member_to_badge_proximity(lines)
+        self.assertEqual(list(df.columns), ['timestamp', 'member', 'observed_id', 'rssi', 'count'])
+        self.assertEqual(df['rssi'].dtype, np.float32)
+        self.assertEqual(df['count'].dtype, np.float32)
+        self.assertEqual(list(df['rssi']), [-60, -75, -128])
+        self.assertEqual(list(df['observed_id']), [1, 2, 1])
+        self.assertEqual(list(members[df['member']]), ['a', 'a', 'b'])
+
+    def test_non_integral_rssi(self):
+        # The dtypes do not depend on the values, which are not truncated
+        lines = [_proximity_line(1500000000, 'a', {'1': {'rssi': -60.5, 'count': 2}, '2': {'rssi': -75, 'count': 1}}),
+                 _proximity_line(1500000010, 'b', {'1': {'rssi': -200, 'count': 3}})]
+        df, members = _read_member_to_badge_proximity(lines)
+        self.assertEqual(df['rssi'].dtype, np.float32)
+        self.assertEqual(list(df['rssi']), [-60.5, -75, -200])
+        self.assertEqual(df['count'].dtype, np.float32)
+
+
+class TestMemberToBadgeProximityFromLogs(unittest.TestCase):
+
+    def setUp(self):
+        self._dir = tempfile.mkdtemp()
+        self._logs = []
+        for i, member in enumerate(['a', 'b']):
+            self._logs.append(os.path.join(self._dir, 'log{}.txt'.format(i)))
+            with open(self._logs[-1], 'w') as f:
+                for t in range(5):
+                    f.write(_proximity_line(1500000000 + 60 * t + i, member,
+                                            {str(k): {'rssi': -50 - k - t, 'count': k} for k in range(1, 4)}) + '\n')
+
+    def tearDown(self):
+        shutil.rmtree(self._dir)
+
+    def test_cache_dir(self):
+        expected = member_to_badge_proximity_from_logs(self._logs)
+        cache_dir = os.path.join(self._dir, 'cache')
+        for _ in range(2):
+            df = member_to_badge_proximity_from_logs(self._logs, cache_dir=cache_dir)
+            pd.testing.assert_frame_equal(df, expected)
+        self.assertEqual(len(os.listdir(cache_dir)), len(self._logs))
+
+
+class TestMemberToMemberProximity(unittest.TestCase):
+
+    def test_groupby(self):
+        start = pd.Timestamp('2017-01-01', tz='US/Eastern')
+        id2m = pd.Series({k: 'm{}'.format(k) for k in range(8)}, name='member')
+        id2m_in_time = pd.Series({(start + pd.Timedelta(minutes=t), k): 'm{}'.format(k)
+                                  for t in range(30) for k in range(8)}, name='member')
+        id2m_in_time.index.names = ['datetime', 'id']
+
+        for seed in range(3):
+            m2badge = _m2badge(seed)
+            for mapping in (id2m, id2m_in_time):
+                # The weighted means are summed in double precision, rather than in the precision
+                # of the rssi
+                pd.testing.assert_frame_equal(member_to_member_proximity(m2badge, mapping),
+                                              _member_to_member_proximity_groupby(m2badge, mapping),
+                                              check_dtype=False)
+
+    def test_no_members(self):
+        id2m = pd.Series({100: 'x'}, name='member')
+        df = member_to_member_proximity(_m2badge(0), id2m)
+        self.assertEqual(len(df), 0)
+        self.assertEqual(list(df.index.names), ['datetime', 'member1', 'member2'])
+
+
+class TestMemberToBeaconProximityFillGaps(unittest.TestCase):
+
+    def test_resample(self):
+        for tz in ('US/Eastern', 'Asia/Kolkata', None):
+            for aligned in (True, False):
+                for time_bins_size, bin_seconds in (('30s', 30), ('1min', 60), ('5min', 300), ('1h', 3600)):
+                    for max_gap_size in (1, 2, 5, None):
+                        for n in (40, 300):
+                            m2b = _m2b(n + bin_seconds, n, bin_seconds, aligned, tz)
+                            pd.testing.assert_frame_equal(
+                                member_to_beacon_proximity_fill_gaps(m2b, time_bins_size=time_bins_size,
+                                                                     max_gap_size=max_gap_size),
+                                _member_to_beacon_proximity_fill_gaps_resample(m2b, time_bins_size, max_gap_size),
+                                check_dtype=False, check_index_type=False)
+
+    def test_dst(self):
+        # The bins keep their size across the DST change, at 2:00 (EST) which is followed by 3:00 (EDT)
+        datetimes = pd.DatetimeIndex(['2017-03-12 01:58', '2017-03-12 03:01'], tz='US/Eastern')
+        m2b = pd.DataFrame({'rssi': [-60., -70.], 'rssi_std': [1., 2.], 'rssi_smooth_window_count': [1., 1.]},
+                           index=pd.MultiIndex.from_arrays([datetimes, ['a', 'a'], [1, 1]],
+                                                           names=['datetime', 'member', 'beacon']))
+        df = member_to_beacon_proximity_fill_gaps(m2b, max_gap_size=None)
+        self.assertEqual(list(df.index.get_level_values('datetime')),
+                         list(pd.DatetimeIndex(['2017-03-12 01:58', '2017-03-12 01:59',
+                                                '2017-03-12 03:00', '2017-03-12 03:01'], tz='US/Eastern')))
+        self.assertEqual(list(df['rssi']), [-60., -60., -60., -70.])
+
+
+class TestRollingByRun(unittest.TestCase):
+
+    def _check(self, rng, window_size, n_runs, steps):
+        runs = np.sort(rng.randint(0, n_runs, 400))
+        nanos = np.concatenate([1500000000 * 10 ** 9 + rng.randint(0, 10 ** 12, dtype=np.int64)
+                                + np.cumsum(rng.choice(steps, (runs == run).sum()))
+                                for run in np.unique(runs)])
+        datetimes = pd.DatetimeIndex(pd.to_datetime(nanos)).tz_localize('UTC').tz_convert('US/Eastern')
+        values = rng.normal(-70, 10, len(runs))
+        is_new = np.append(True, runs[1:] != runs[:-1])
+
+        for min_periods in (1, 3):
+            rolling = _rolling_by_run(values, datetimes, is_new, window_size, min_periods)
+            expected = pd.Series(values, index=datetimes).groupby(runs) \
+                .rolling(window=window_size, min_periods=min_periods)
+            for statistic in ('median', 'std', 'count'):
+                np.testing.assert_allclose(getattr(rolling, statistic)().values,
+                                           getattr(expected, statistic)().values)
+
+    def test_groupby(self):
+        rng = np.random.RandomState(0)
+        for window_size in ('90s', '1min', '5min', '2h'):
+            window = pd.Timedelta(window_size).value
+            # steps just under, at and just over the window, much shorter and much longer
+            steps = np.array([window - 1, window, window + 1, 0, 1, window // 3, 7 * window, 10 ** 9],
+                             dtype=np.int64)
+            for n_runs in (1, 12):
+                self._check(rng, window_size, n_runs, steps)
+
+    def test_long_window(self):
+        # The gaps between the runs would overflow the clock, and the runs are rolled one at a time
+        rng = np.random.RandomState(1)
+        self._check(rng, '36500D', 12, np.array([0, 10 ** 9, 10 ** 12], dtype=np.int64))
+
+
+if __name__ == '__main__':
+    sys.exit(unittest.main())
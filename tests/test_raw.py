@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_raw
+----------------------------------
+
+Tests for the `openbadge_analysis.preprocessing.raw` module.
+"""
+
+
+import sys
+import unittest
+import os
+import io
+import json
+import shutil
+import tempfile
+import datetime
+
+# add the 'src' directory as one where we can import modules
+src_dir = os.path.join(os.getcwd(), os.pardir)
+sys.path.append(src_dir)
+
+from openbadge_analysis.preprocessing.raw import split_raw_data_by_day
+
+
+class TestSplitRawDataByDay(unittest.TestCase):
+
+    def setUp(self):
+        self._target = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._target)
+
+    def test_split(self):
+        timestamps = [1500000000, 1500000010, 1500100000]
+        lines = [json.dumps({'type': 'meeting started', 'data': {'log_version': '2.0'}})]
+        for timestamp in timestamps:
+            # compact, unlike what json.dump writes
+            lines.append('{"type":"audio received","data":{"timestamp":%d,"member":"a"}}' % timestamp)
+            lines.append('{"type":"proximity received","data":{"timestamp":%d,"member":"a"}}' % timestamp)
+
+        split_raw_data_by_day(io.StringIO(u'\n'.join(lines) + u'\n'), self._target, 'audio')
+
+        expected = {}
+        for timestamp in timestamps:
+            day = datetime.date.fromtimestamp(timestamp).isoformat()
+            data = {'type': 'audio received', 'data': {'timestamp': timestamp, 'member': 'a'}}
+            expected[day] = expected.get(day, '') + json.dumps(data) + '\n'
+
+        self.assertEqual(sorted(os.listdir(self._target)), sorted(expected))
+        for day, content in expected.items():
+            with open(os.path.join(self._target, day)) as f:
+                self.assertEqual(f.read(), content)
+
+    def test_no_log_version(self):
+        lines = u'{"type": "audio received", "data": {"timestamp": 1500000000}}\n'
+
+        with self.assertRaises(Exception) as context:
+            split_raw_data_by_day(io.StringIO(lines), self._target, 'audio')
+
+        self.assertIn('cannot be identified', str(context.exception))
+
+
+if __name__ == '__main__':
+    unittest.main()